@@ -0,0 +1,500 @@
+#             Perforce Defect Tracking Integration Project
+#              <http://www.ravenbrook.com/project/p4dti/>
+#
+#   ABSTRACT_SCHEMA.PY -- MAKE PICKLES FROM BUGZILLA'S ABSTRACT SCHEMA
+#
+#             Ravenbrook Limited, 2026-10-17
+#
+#
+# 1. INTRODUCTION
+#
+# Since 2.20, Bugzilla has defined its schema in Bugzilla/DB/Schema.pm,
+# as a Perl data structure (ABSTRACT_SCHEMA) which Bugzilla turns into
+# tables for each kind of database.  This module reads that structure
+# from a Bugzilla source tree, works out the tables that Bugzilla would
+# make on MySQL, and writes the same pickle as pickle_schema.py would
+# have made from a fresh install, without installing Bugzilla or
+# running MySQL.  For instance:
+#
+#   >>> import abstract_schema
+#   >>> abstract_schema.pickle_abstract_schema('4.4.2', '/src/bugzilla-4.4.2')
+#
+# Only the tables in ABSTRACT_SCHEMA are included: a fresh install
+# has no custom fields.  Index cardinality is None, as for
+# dump_schema.py.
+#
+# The intended readership is project developers.
+#
+# This document is not confidential.
+
+import os
+import re
+import dump_schema
+import get_schema
+import schema_remarks
+import schema_store
+
+error = 'reading an abstract schema'
+
+# 2. Reading Perl data.
+#
+# ABSTRACT_SCHEMA is written as Perl hashes ({...}) and arrays ([...])
+# of strings, numbers, barewords and qw() lists.  We read a hash as a
+# list of (key, value) pairs, in order, and an array as a list.
+
+perl_token_re = re.compile(r"""
+    \s+ | \#[^\n]*                              # space and comments
+  | (?P<punct>=>|[,;{}\[\].])
+  | '(?P<single>(?:[^'\\]|\\.)*)'
+  | "(?P<double>(?:[^"\\]|\\.)*)"
+  | qw\s*(?:\((?P<qw1>[^)]*)\)|\[(?P<qw2>[^\]]*)\]|\{(?P<qw3>[^}]*)\}|/(?P<qw4>[^/]*)/)
+  | (?P<number>-?\d+(?:\.\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z_0-9:]*)
+""", re.X)
+
+single_escape_re = re.compile(r"\\([\\'])")
+double_escapes = {'n': '\n', 't': '\t', '\\': '\\', '"': '"', '$': '$', '@': '@'}
+
+# Perl constants which may be used as values, and their values, as
+# well as those read from Bugzilla/Constants.pm (see section 4).
+
+perl_constants = {}
+
+class perl_reader:
+    def __init__(self, text, position, constants=None):
+        self.text = text
+        self.position = position
+        if constants is None:
+            constants = perl_constants
+        self.constants = constants
+        self.next_token()
+
+    def next_token(self):
+        while 1:
+            if self.position >= len(self.text):
+                self.token = None
+                return
+            m = perl_token_re.match(self.text, self.position)
+            if m is None:
+                raise error, ("Can't read Perl at '%s'."
+                              % self.text[self.position:self.position + 40])
+            self.position = m.end()
+            kind = m.lastgroup
+            if kind is None:
+                continue
+            value = m.group(kind)
+            if kind == 'single':
+                value = single_escape_re.sub(r'\1', value)
+                kind = 'string'
+            elif kind == 'double':
+                value = re.sub(r'\\(.)',
+                               lambda e: double_escapes.get(e.group(1), e.group(1)),
+                               value)
+                kind = 'string'
+            elif kind[:2] == 'qw':
+                value = value.split()
+                kind = 'qw'
+            self.token = (kind, value)
+            return
+
+    def expect(self, punct):
+        if self.token != ('punct', punct):
+            raise error, "Expected '%s' but found %s." % (punct, self.token)
+        self.next_token()
+
+    # Read a list of values up to the closing punctuation, treating
+    # '=>' as ',' and a bareword before '=>' as a string.
+
+    def read_list(self, close):
+        values = []
+        while self.token != ('punct', close):
+            if self.token is None:
+                raise error, "Expected '%s' but the text ended." % close
+            if self.token[0] == 'punct' and self.token[1] in (',', '=>'):
+                self.next_token()
+                continue
+            if self.token[0] == 'qw':
+                values.extend(self.token[1])
+                self.next_token()
+                continue
+            if self.token[0] == 'word':
+                word = self.token[1]
+                self.next_token()
+                if self.token == ('punct', '=>'):
+                    values.append(word)
+                    continue
+                values.append(self.concatenate(self.constant(word)))
+                continue
+            values.append(self.read_value())
+        self.next_token()
+        return values
+
+    def constant(self, word):
+        if not self.constants.has_key(word):
+            raise error, "Unknown Perl constant '%s'." % word
+        return self.constants[word]
+
+    def concatenate(self, value):
+        while self.token == ('punct', '.'):
+            self.next_token()
+            value = value + str(self.read_value())
+        return value
+
+    def read_value(self):
+        (kind, value) = self.token
+        if (kind, value) == ('punct', '{'):
+            self.next_token()
+            items = self.read_list('}')
+            if len(items) % 2:
+                raise error, "Odd number of elements in a Perl hash."
+            return map(None, items[0::2], items[1::2])
+        if (kind, value) == ('punct', '['):
+            self.next_token()
+            return self.read_list(']')
+        if kind in ('string', 'number'):
+            self.next_token()
+            return self.concatenate(value)
+        if kind == 'word':
+            self.next_token()
+            return self.concatenate(self.constant(value))
+        raise error, "Unexpected %s '%s'." % (kind, value)
+
+# Return the Perl value of the constant called name in text, as
+# defined with 'use constant name => value'.
+
+def read_constant(text, name, constants=None):
+    m = re.search(r'use\s+constant\s+%s\s*=>\s*' % name, text)
+    if m is None:
+        raise error, "No definition of %s." % name
+    return perl_reader(text, m.end(), constants).read_value()
+
+# Return a map from name to value of the constants defined in text
+# with 'use constant NAME => value;' or 'use constant { NAME => value,
+# ... };', starting with those in perl_constants.  A constant whose
+# value is not simple Perl data (an expression, say) is left out, as
+# is a block containing one.
+
+constant_re = re.compile(r'use\s+constant\s+(?:(\w+)\s*=>|(?={))')
+
+def read_constants(text):
+    constants = perl_constants.copy()
+    for m in constant_re.finditer(text):
+        try:
+            reader = perl_reader(text, m.end(), constants)
+            value = reader.read_value()
+            if reader.token != ('punct', ';'):
+                continue
+        except Exception:
+            # not Perl we can read
+            continue
+        if m.group(1):
+            constants[m.group(1)] = value
+        else:
+            for (name, v) in value:
+                constants[name] = v
+    return constants
+
+# 3. Making MySQL tables.
+#
+# This maps the abstract types, as Bugzilla/DB/Mysql.pm does, to
+# (type, extra) as MySQL 5 'describe' shows them.  Other types (such as
+# varchar(64) or decimal(7,2)) are passed on as they are, except that
+# these integer types get their display widths.
+
+mysql_types = {
+    'BOOLEAN':      ('tinyint(4)', ''),
+    'INT1':         ('tinyint(4)', ''),
+    'INT2':         ('smallint(6)', ''),
+    'INT3':         ('mediumint(9)', ''),
+    'INT4':         ('int(11)', ''),
+    'INT8':         ('bigint(20)', ''),
+    'SMALLSERIAL':  ('smallint(6)', 'auto_increment'),
+    'MEDIUMSERIAL': ('mediumint(9)', 'auto_increment'),
+    'INTSERIAL':    ('int(11)', 'auto_increment'),
+    'BIGSERIAL':    ('bigint(20)', 'auto_increment'),
+    'TINYTEXT':     ('tinytext', ''),
+    'MEDIUMTEXT':   ('mediumtext', ''),
+    'LONGTEXT':     ('mediumtext', ''),
+    'LONGBLOB':     ('longblob', ''),
+    'DATETIME':     ('datetime', ''),
+    'DATE':         ('date', ''),
+    }
+
+display_widths = {
+    'tinyint':   'tinyint(4)',
+    'smallint':  'smallint(6)',
+    'mediumint': 'mediumint(9)',
+    'int':       'int(11)',
+    'integer':   'int(11)',
+    'bigint':    'bigint(20)',
+    }
+
+# Abstract defaults are SQL; these are the ones Bugzilla translates.
+
+mysql_defaults = {
+    'TRUE':  '1',
+    'FALSE': '0',
+    }
+
+def mysql_type(abstract_type):
+    if mysql_types.has_key(abstract_type):
+        return mysql_types[abstract_type]
+    t = abstract_type.lower()
+    return (display_widths.get(t, t), '')
+
+# Return the default that 'describe' shows for an abstract DEFAULT.
+# MySQL allows no default for text and blob columns, so Bugzilla
+# gives them none.  The MySQL which made the pickles showed '' as the
+# default of a NOT NULL column with no default (other than an
+# auto_increment column), and showed a decimal default to its scale.
+
+decimal_re = re.compile(r'^decimal\(\d+,(\d+)\)$')
+
+def mysql_default(default, sqltype, null, extra):
+    if default is None or re.search('text|blob', sqltype):
+        if null == 'NO' and extra != 'auto_increment':
+            return ''
+        return None
+    default = str(default)
+    if mysql_defaults.has_key(default.upper()):
+        return mysql_defaults[default.upper()]
+    if default.upper() == 'NULL':
+        return None
+    if default[:1] == "'" and default[-1:] == "'":
+        return dump_schema.unquote_string(default)
+    m = decimal_re.match(sqltype)
+    if m:
+        return '%.*f' % (int(m.group(1)), float(default))
+    return default
+
+# MySQL keeps the keys of a table in this order: the primary key,
+# unique keys on columns which cannot be null, other unique keys,
+# other keys, and full text keys.
+
+def key_rank(key, definitions):
+    (name, kind, parts, index_type) = key
+    if kind == 'PRIMARY':
+        return 0
+    if kind == 'UNIQUE':
+        for (column, sub_part, collation) in parts:
+            if definitions[column]['Null'] == 'YES' or sub_part is not None:
+                return 2
+        return 1
+    if kind == 'FULLTEXT':
+        return 4
+    return 3
+
+index_field_re = re.compile(r'^(\w+)(?:\((\d+)\))?$')
+
+# Make the 'describe' and 'show index' rows for one table of the
+# abstract schema, given its FIELDS and INDEXES lists.
+
+def abstract_table_rows(table, fields, indexes):
+    columns = []
+    definitions = {}
+    keys = []
+    references = []
+    for i in range(0, len(fields), 2):
+        name = fields[i]
+        spec = dict(fields[i + 1])
+        (sqltype, extra) = mysql_type(spec['TYPE'])
+        if spec.get('NOTNULL') or spec.get('PRIMARYKEY'):
+            null = 'NO'
+        else:
+            null = 'YES'
+        definitions[name] = {'Type': sqltype, 'Null': null,
+                             'Default': mysql_default(spec.get('DEFAULT'),
+                                                      sqltype, null, extra),
+                             'Extra': extra}
+        columns.append(name)
+        if spec.get('PRIMARYKEY'):
+            keys.append(('PRIMARY', 'PRIMARY', [(name, None, 'A')], None))
+        if spec.has_key('REFERENCES'):
+            references.append((name, dict(spec['REFERENCES'])))
+    for i in range(0, len(indexes), 2):
+        name = indexes[i]
+        spec = indexes[i + 1]
+        if spec and type(spec[0]) == type(()):
+            spec = dict(spec)
+            index_fields = spec['FIELDS']
+            kind = spec.get('TYPE') or 'KEY'
+        else:
+            index_fields = spec
+            kind = 'KEY'
+        parts = []
+        for f in index_fields:
+            if type(f) == type([]):
+                f = dict(f)
+                length = f.get('LENGTH')
+                if length is not None:
+                    length = long(length)
+                parts.append((f['COLUMN'], length, 'A'))
+                continue
+            m = index_field_re.match(f)
+            if m is None:
+                raise error, ("Can't read field '%s' of index '%s'."
+                              % (f, name))
+            (column, length) = m.groups()
+            if length is not None:
+                length = long(length)
+            parts.append((column, length, 'A'))
+        keys.append((name, kind, parts, None))
+    # InnoDB makes an index for a foreign key whose column is not the
+    # first column of an index, named after the constraint.
+    for (column, ref) in references:
+        if not filter(lambda k, c=column: k[2][0][0] == c, keys):
+            keys.append(('fk_%s_%s_%s_%s' % (table, column, ref['TABLE'],
+                                             ref['COLUMN']),
+                         'KEY', [(column, None, 'A')], None))
+    ranked = map(lambda i, k=keys, d=definitions: (key_rank(k[i], d), i),
+                 range(len(keys)))
+    ranked.sort()
+    keys = map(lambda r, k=keys: k[r[1]], ranked)
+    return dump_schema.table_rows(table, columns, definitions, keys)
+
+# 4. Reading a schema.
+#
+# read_abstract_schema returns the schema in ABSTRACT_SCHEMA as a map
+# from table name to (columns, indexes), as
+# pickle_schema.describe_schema does.  path is Bugzilla/DB/Schema.pm,
+# or the top of a Bugzilla source tree.  The schema uses constants
+# from Bugzilla::Constants (FIELD_TYPE_UNKNOWN, for instance), so we
+# read those from Bugzilla/Constants.pm in the same tree.
+
+def source_top(path):
+    if os.path.isdir(path):
+        return path
+    return os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(path))))
+
+def schema_pm_path(path):
+    if os.path.isdir(path):
+        return os.path.join(path, 'Bugzilla', 'DB', 'Schema.pm')
+    return path
+
+def constants_pm_path(path):
+    return os.path.join(source_top(path), 'Bugzilla', 'Constants.pm')
+
+def read_file(path):
+    f = open(path, 'r')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+def read_abstract_schema(path):
+    text = read_file(schema_pm_path(path))
+    if os.path.exists(constants_pm_path(path)):
+        constants = read_constants(read_file(constants_pm_path(path)))
+    else:
+        constants = perl_constants
+    schema = {}
+    for (table, spec) in read_constant(text, 'ABSTRACT_SCHEMA', constants):
+        spec = dict(spec)
+        schema[table] = abstract_table_rows(table, spec['FIELDS'],
+                                            spec.get('INDEXES', []))
+    return schema
+
+# Read the abstract schema and write it to a pickle (unless an
+# existing pickle has the same schema), as pickle_schema.pickle_schema
+# does.
+
+def pickle_abstract_schema(schema_version, path):
+    name = get_schema.save_schema(schema_version, read_abstract_schema(path))
+    print get_schema.version_map_entry(schema_version, name)
+    return name
+
+# 5. Checking against a pickle.
+#
+# check_abstract_schema reads the abstract schema from a Bugzilla
+# source tree and compares it, reduced, with the pickle to which
+# schema_remarks.version_schema_map maps schema_version, which should
+# be the Bugzilla version of the tree.  It prints the differences and
+# returns the number of tables which differ.  Tables which Bugzilla
+# makes outside ABSTRACT_SCHEMA (such as bz_schema) are ignored.  For
+# instance:
+#
+#   >>> import abstract_schema
+#   >>> abstract_schema.check_abstract_schema('3.4.2', '/src/bugzilla-3.4.2')
+
+# The values of reduced records, without their remarks.
+
+def reduced_map(records):
+    reduced = {}
+    for (k, r) in records.items():
+        reduced[k] = r.values()[:-1]
+    return reduced
+
+def check_abstract_schema(schema_version, path):
+    name = schema_remarks.version_schema_map[schema_version]
+    pickled = schema_store.load_schema(name)[1]
+    abstract = read_abstract_schema(path)
+    tables = abstract.keys()
+    tables.sort()
+    differ = 0
+    for table in tables:
+        if not pickled.has_key(table):
+            print "%s: not in pickle '%s'." % (table, name)
+            differ = differ + 1
+            continue
+        (ac, ai, ae) = get_schema.reduce_table(table, abstract[table])
+        (pc, pi, pe) = get_schema.reduce_table(table, pickled[table])
+        problems = []
+        for (what, a, p) in (('column', reduced_map(ac), reduced_map(pc)),
+                             ('index', reduced_map(ai), reduced_map(pi))):
+            keys = a.keys() + filter(lambda k, a=a: not a.has_key(k), p.keys())
+            keys.sort()
+            for k in keys:
+                if a.get(k) != p.get(k):
+                    problems.append("%s '%s': abstract %s, pickle %s"
+                                    % (what, k, a.get(k), p.get(k)))
+        if problems:
+            differ = differ + 1
+            print '%s:' % table
+            for problem in problems:
+                print '  %s' % problem
+    print "%d of %d tables differ from pickle '%s'." % (differ, len(tables),
+                                                         name)
+    return differ
+
+
+# A. REFERENCES
+#
+#
+# B. DOCUMENT HISTORY
+#
+# 2026-10-17 Created.
+#
+#
+# C. COPYRIGHT AND LICENSE
+#
+# This file is copyright (c) 2026 Perforce Software, Inc.  All rights
+# reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1.  Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+# 2.  Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# HOLDERS AND CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS
+# OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR
+# TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGE.
+#
+#
+# $Id$
@@ -0,0 +1,311 @@
+#             Perforce Defect Tracking Integration Project
+#              <http://www.ravenbrook.com/project/p4dti/>
+#
+#       BENCH_SCHEMA_DOC.PY -- TIME SCHEMA DOCUMENT GENERATION
+#
+#             Ravenbrook Limited, 2026-10-17
+#
+#
+# 1. INTRODUCTION
+#
+# This module times the generation of schema documents for some wide
+# version ranges, so that changes to the generator can be checked for
+# speed as well as for correctness.  Run it from the top directory:
+#
+#   python bench_schema_doc.py
+#
+# The intended readership is project developers.
+#
+# This document is not confidential.
+
+import bisect
+import multiprocessing
+import sys
+import time
+
+import get_schema
+import make_schema_doc
+import schema_store
+
+# Wide ranges, which load the most schemas.
+
+wide_ranges = [
+    ('2.0', '3.4.2'),
+    ('2.0', '2.23.4'),
+    ('2.14', '3.4.2'),
+    ('2.16', '3.2'),
+    ]
+
+repeats = 5
+
+# Time generating the doc for a range, from cold: with nothing in the
+# schema cache, no cached reduced schemas on disk, and no history of
+# every version (see make_schema_doc section 7).  Returns the best of
+# 'repeats' runs, in seconds.
+
+def time_range(first, last, processes=0):
+    best = None
+    make_schema_doc.parallel_processes = processes
+    cache_dir = get_schema.reduced_cache_dir
+    get_schema.reduced_cache_dir = None
+    try:
+        for i in range(repeats):
+            get_schema.schema_cache.clear()
+            make_schema_doc.reset_history()
+            start = time.time()
+            make_schema_doc.make_tables(first, last)
+            t = time.time() - start
+            if best is None or t < best:
+                best = t
+    finally:
+        get_schema.reduced_cache_dir = cache_dir
+        make_schema_doc.parallel_processes = 0
+    return best
+
+# Time loading and reducing every schema, from cold, in the same way.
+
+def time_load(processes=0):
+    best = None
+    cache_dir = get_schema.reduced_cache_dir
+    get_schema.reduced_cache_dir = None
+    try:
+        for i in range(repeats):
+            get_schema.schema_cache.clear()
+            start = time.time()
+            get_schema.get_schemas(schema_store.schema_names(), [], processes)
+            t = time.time() - start
+            if best is None or t < best:
+                best = t
+    finally:
+        get_schema.reduced_cache_dir = cache_dir
+    return best
+
+# 2. Serial and parallel loading.
+#
+# Compare loading schemas one after another with loading them over a
+# pool of worker processes, one per CPU.
+
+def bench_parallel(processes=None):
+    if processes is None:
+        processes = max(multiprocessing.cpu_count(), 2)
+    print 'Serial against %d worker processes (%d CPUs):' % (
+        processes, multiprocessing.cpu_count())
+    for (first, last) in wide_ranges:
+        serial = time_range(first, last)
+        parallel = time_range(first, last, processes)
+        print '  %-8s to %-8s  serial %6.3fs  parallel %6.3fs  speedup %.2f' % (
+            first, last, serial, parallel, serial / parallel)
+    serial = time_load()
+    parallel = time_load(processes)
+    print '  all schemas, loading only  serial %6.3fs  parallel %6.3fs  speedup %.2f' % (
+        serial, parallel, serial / parallel)
+
+# 3. Memory.
+#
+# The memory held by the schema cache after generating the doc for
+# the full range: the total size of all the distinct objects reachable
+# from the cached schemas.
+
+def deep_size(x, seen):
+    if seen.has_key(id(x)):
+        return 0
+    seen[id(x)] = x
+    size = sys.getsizeof(x)
+    if isinstance(x, dict):
+        for (k, v) in x.items():
+            size = size + deep_size(k, seen) + deep_size(v, seen)
+    elif isinstance(x, (tuple, list)):
+        for v in x:
+            size = size + deep_size(v, seen)
+    elif isinstance(x, get_schema.mapping_view):
+        for v in x.values():
+            size = size + deep_size(v, seen)
+    return size
+
+def bench_memory():
+    get_schema.schema_cache.clear()
+    (first, last) = wide_ranges[0]
+    make_schema_doc.make_tables(first, last)
+    seen = {}
+    size = 0
+    for entry in get_schema.schema_cache.entries.values():
+        size = size + deep_size(entry['schema'], seen)
+    print 'Schema cache after %s to %s: %d schemas, %d objects, %d bytes' % (
+        first, last, len(get_schema.schema_cache.entries), len(seen), size)
+
+# 4. Narrow queries.
+#
+# The time to work out the history of a few tables over the full
+# range, from cold, against the time for all the tables.  Lazy schemas
+# read and reduce only the tables asked for, so this should grow with
+# the number of tables.
+
+narrow_tables = ['bugs', 'longdescs', 'profiles', 'products',
+                 'components', 'attachments', 'groups', 'versions',
+                 'milestones', 'keywords']
+
+def time_tables(first, last, tables):
+    best = None
+    cache_dir = get_schema.reduced_cache_dir
+    get_schema.reduced_cache_dir = None
+    try:
+        for i in range(repeats):
+            get_schema.schema_cache.clear()
+            get_schema.table_cache.clear()
+            make_schema_doc.reset_history()
+            start = time.time()
+            make_schema_doc.get_versioned_tables(first, last, tables)
+            t = time.time() - start
+            if best is None or t < best:
+                best = t
+    finally:
+        get_schema.reduced_cache_dir = cache_dir
+    return best
+
+def bench_narrow():
+    (first, last) = wide_ranges[0]
+    print 'History of %s to %s, by number of tables:' % (first, last)
+    for n in [1, 2, 5, 10]:
+        print '  %3d table(s)  %6.3fs' % (n, time_tables(first, last,
+                                                        narrow_tables[:n]))
+    print '  all tables    %6.3fs' % time_tables(first, last, None)
+
+# 5. Version comparison.
+#
+# The time to generate the doc for the full range with the schemas
+# already loaded, so that most of the time goes on the remarks, and
+# so on comparing versions (see make_schema_doc.versioning_dict).  The
+# same again with a registry which parses version names on every
+# comparison, as make_schema_doc.version_compare once did, shows the
+# saving from parsing each name once.
+
+class parsing_registry(make_schema_doc.version_registry):
+    def ordinal(self, v):
+        key = make_schema_doc.version_key(v)
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return 2 * i + 1
+        return 2 * i
+
+def time_render(first, last):
+    best = None
+    make_schema_doc.make_tables(first, last)
+    for i in range(repeats):
+        make_schema_doc.vd_cache.clear()
+        start = time.time()
+        make_schema_doc.make_tables(first, last)
+        t = time.time() - start
+        if best is None or t < best:
+            best = t
+    return best
+
+def bench_versions():
+    (first, last) = wide_ranges[0]
+    registry = make_schema_doc.get_version_registry()
+    try:
+        make_schema_doc.the_version_registry = parsing_registry(
+            registry.versions)
+        parsing = time_render(first, last)
+    finally:
+        make_schema_doc.reset_version_registry()
+    ordinals = time_render(first, last)
+    print 'Warm render of %s to %s:' % (first, last)
+    print '  parsing %6.3fs  ordinals %6.3fs  speedup %.2f' % (
+        parsing, ordinals, parsing / ordinals)
+
+# 6. Projecting the history.
+#
+# The time to work out the history of some ranges with the schemas
+# already loaded, building it from the schemas against projecting it
+# from the history of every version.
+
+def time_history(first, last, use_history):
+    best = None
+    make_schema_doc.use_history = use_history
+    try:
+        make_schema_doc.get_versioned_tables(first, last)
+        for i in range(repeats):
+            start = time.time()
+            make_schema_doc.get_versioned_tables(first, last)
+            t = time.time() - start
+            if best is None or t < best:
+                best = t
+    finally:
+        make_schema_doc.use_history = 1
+    return best
+
+def bench_history():
+    print 'Warm history, built against projected:'
+    for (first, last) in wide_ranges + [('3.0', '3.0'), ('3.2', '3.4.2')]:
+        built = time_history(first, last, 0)
+        projected = time_history(first, last, 1)
+        print '  %-8s to %-8s  built %6.3fs  projected %6.3fs  speedup %.2f' % (
+            first, last, built, projected, built / projected)
+
+# 7. Schema change events.
+#
+# The time to ask what changed between two versions, from the log of
+# schema change events (see make_schema_doc section 8).
+
+def bench_events():
+    make_schema_doc.get_history()
+    print 'What changed:'
+    for (first, last) in wide_ranges + [('3.0', '3.2')]:
+        best = None
+        for i in range(repeats):
+            start = time.time()
+            events = make_schema_doc.schema_events(first, last)
+            t = time.time() - start
+            if best is None or t < best:
+                best = t
+        print '  %-8s to %-8s  %4d events  %8.6fs' % (first, last,
+                                                      len(events), best)
+
+if __name__ == '__main__':
+    bench_parallel()
+    bench_memory()
+    bench_narrow()
+    bench_versions()
+    bench_history()
+    bench_events()
+
+# A. REFERENCES
+#
+#
+# B. DOCUMENT HISTORY
+#
+# 2026-10-17 Created.
+#
+#
+# C. COPYRIGHT AND LICENSE
+#
+# This file is copyright (c) 2026 Perforce Software, Inc.  All rights
+# reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1.  Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+# 2.  Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# HOLDERS AND CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS
+# OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR
+# TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGE.
+#
+#
+# $Id$
@@ -0,0 +1,443 @@
+#             Perforce Defect Tracking Integration Project
+#              <http://www.ravenbrook.com/project/p4dti/>
+#
+#      DUMP_SCHEMA.PY -- MAKE PICKLES OF SCHEMAS FROM MYSQLDUMP FILES
+#
+#             Ravenbrook Limited, 2026-10-17
+#
+#
+# 1. INTRODUCTION
+#
+# This module reads the schema of a Bugzilla database from a file made
+# by mysqldump, and makes the same pickle as pickle_schema.py would
+# have made from the live database, without needing a MySQL server.
+#
+# A dump of a production database is mostly INSERT statements, and
+# may be many gigabytes long.  We only want the CREATE TABLE
+# statements, so the dump is read in chunks and scanned for them; the
+# data between them is never split into lines or parsed.  Memory use is a chunk plus one CREATE TABLE
+# statement, whatever the size of the dump.  A dump whose name ends
+# in '.gz' is read through gzip.
+#
+# For instance:
+#
+#   >>> import dump_schema
+#   >>> dump_schema.pickle_dump('4.4.2', 'bugs-4.4.2.sql.gz')
+#
+# The intended readership is project developers.
+#
+# This document is not confidential.
+
+import gzip
+import re
+import get_schema
+
+error = 'reading a schema from a dump'
+
+# 2. Finding the statements.
+#
+# mysqldump writes each statement from the start of a line, and
+# escapes newlines in data, so a line starting with 'CREATE TABLE ' or
+# 'USE ' always starts one of the statements we want.  A CREATE TABLE
+# statement ends with a line starting with ')' and ending with ';'.
+
+chunk_size = 1 << 20
+
+statement_markers = ['CREATE TABLE ', 'USE ']
+create_end_re = re.compile('^\\)[^\\n]*;[ \\t\\r]*$', re.M)
+line_end_re = re.compile('$', re.M)
+
+# The longest a partial line can be, and still turn out to be the
+# start of a statement we want.
+
+marker_length = len('CREATE TABLE ')
+
+def open_dump(path):
+    if path[-3:] == '.gz':
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+# Return the position of the first statement we want in buffer, or -1.
+# str.find is much quicker than a regular expression for this.
+
+def find_statement(buffer):
+    first = -1
+    for marker in statement_markers:
+        if buffer[:len(marker)] == marker:
+            return 0
+        i = buffer.find('\n' + marker)
+        if i >= 0 and (first < 0 or i < first):
+            first = i
+    if first < 0:
+        return -1
+    return first + 1
+
+# Generate the CREATE TABLE and USE statements in a dump file, as
+# strings.  buffer always starts at the start of a line, unless
+# skip_line is set, in which case it starts in the middle of a line
+# which we have decided not to keep.
+
+def dump_statements(f):
+    buffer = ''
+    skip_line = False
+    end = False
+    while 1:
+        if skip_line:
+            nl = buffer.find('\n')
+            if nl < 0:
+                buffer = ''
+            else:
+                buffer = buffer[nl + 1:]
+                skip_line = False
+        start = -1
+        if not skip_line:
+            start = find_statement(buffer)
+        if start >= 0:
+            if buffer[start:start + 4] == 'USE ':
+                e = line_end_re.search(buffer, start)
+            else:
+                e = create_end_re.search(buffer, start)
+            # A match at the very end of the buffer may not be the
+            # end of the line.
+            if e is not None and (e.end() < len(buffer) or end):
+                yield buffer[start:e.end()]
+                buffer = buffer[e.end():]
+                continue
+            # The statement goes on into the next chunk.
+            buffer = buffer[start:]
+        elif not skip_line:
+            # No statement here; keep the start of the last line only
+            # if it could still turn out to be one.
+            last = buffer.rfind('\n') + 1
+            if len(buffer) - last >= marker_length:
+                buffer = ''
+                skip_line = True
+            else:
+                buffer = buffer[last:]
+        if end:
+            return
+        chunk = f.read(chunk_size)
+        if not chunk:
+            end = True
+        buffer = buffer + chunk
+
+# 3. Parsing a CREATE TABLE statement.
+#
+# We make the rows that 'describe' and 'show index' would return, with
+# the same keys (inserted in the same order) as pickle_schema.py.  A
+# dump does not say how many distinct values an index has, so the
+# Cardinality of every index row is None.
+
+quoted = "'(?:[^'\\\\]|\\\\.|'')*'"
+identifier = '`(?:[^`]|``)*`'
+
+type_re = re.compile('([a-zA-Z]+(?:\\((?:%s|[^)\'])*\\))?'
+                     '(?:\\s+(?:unsigned|zerofill|binary))*)\\s*' % quoted)
+token_re = re.compile('%s|[^\\s(]+(?:\\((?:%s|[^)\'])*\\))?' % (quoted, quoted))
+key_re = re.compile('(PRIMARY KEY|UNIQUE KEY|UNIQUE INDEX|KEY|INDEX|'
+                    'FULLTEXT KEY|FULLTEXT INDEX|SPATIAL KEY|SPATIAL INDEX)'
+                    '\\s*(%s)?\\s*\\(((?:%s|%s|\\([^)]*\\)|[^()\'`])*)\\)(.*)$'
+                    % (identifier, quoted, identifier))
+part_re = re.compile('(%s)(?:\\((\\d+)\\))?(\\s+(?:ASC|DESC))?' % identifier)
+engine_re = re.compile('ENGINE=(\\w+)')
+
+escapes = {'0': '\0', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\032'}
+
+def unquote_identifier(s):
+    return s[1:-1].replace('``', '`')
+
+def unquote_string(s):
+    s = s[1:-1]
+    if '\\' not in s:
+        return s.replace("''", "'")
+    result = []
+    i = 0
+    while i < len(s):
+        c = s[i]
+        if c == '\\' and i + 1 < len(s):
+            i = i + 1
+            c = escapes.get(s[i], s[i])
+        elif c == "'" and s[i + 1:i + 2] == "'":
+            i = i + 1
+        result.append(c)
+        i = i + 1
+    return ''.join(result)
+
+# Split the key parts of an index at the commas which are not in
+# parentheses or quotes.
+
+def split_parts(parts):
+    result = []
+    depth = 0
+    start = 0
+    for m in re.finditer("%s|%s|[(),]" % (quoted, identifier), parts):
+        c = m.group(0)
+        if c == '(':
+            depth = depth + 1
+        elif c == ')':
+            depth = depth - 1
+        elif c == ',' and depth == 0:
+            result.append(parts[start:m.start()].strip())
+            start = m.end()
+    result.append(parts[start:].strip())
+    return result
+
+# Parse a column definition (after its name) into a map with the
+# entries 'Type', 'Null', 'Default', 'Extra'.
+
+def parse_column(definition):
+    m = type_re.match(definition)
+    if m is None:
+        raise error, "Can't parse column definition '%s'." % definition
+    sqltype = m.group(1)
+    tokens = token_re.findall(definition[m.end():])
+    null = 'YES'
+    default = None
+    extra = []
+    i = 0
+    while i < len(tokens):
+        t = tokens[i].upper()
+        if t == 'NOT' and i + 1 < len(tokens) and tokens[i + 1].upper() == 'NULL':
+            null = 'NO'
+            i = i + 1
+        elif t == 'DEFAULT' and i + 1 < len(tokens):
+            i = i + 1
+            value = tokens[i]
+            if value[:1] == "'":
+                default = unquote_string(value)
+            elif value.upper() == 'NULL':
+                default = None
+            else:
+                default = value
+        elif t == 'AUTO_INCREMENT':
+            extra.append('auto_increment')
+        elif t == 'ON' and i + 2 < len(tokens) and tokens[i + 1].upper() == 'UPDATE':
+            extra.append('on update %s' % tokens[i + 2])
+            i = i + 2
+        elif t in ('COMMENT', 'COLLATE', 'CHARSET', 'COLUMN_FORMAT', 'STORAGE'):
+            i = i + 1
+        elif t == 'CHARACTER' and i + 1 < len(tokens):
+            i = i + 2
+        i = i + 1
+    return {'Type': sqltype, 'Null': null, 'Default': default,
+            'Extra': ' '.join(extra)}
+
+# Parse an index definition into (key name, kind, parts, index type),
+# where parts is a list of (column name, sub part, collation).
+
+def parse_key(line):
+    m = key_re.match(line)
+    if m is None:
+        return None
+    (kind, name, parts, rest) = m.groups()
+    kind = kind.split()[0]
+    if kind == 'PRIMARY':
+        name = 'PRIMARY'
+    elif name is None:
+        raise error, "Index without a name: '%s'." % line
+    else:
+        name = unquote_identifier(name)
+    index_type = None
+    u = re.search('USING (\\w+)', rest)
+    if u:
+        index_type = u.group(1).upper()
+    result = []
+    for part in split_parts(parts):
+        p = part_re.match(part)
+        if p is None:
+            # An expression, which has no column name.
+            result.append((None, None, 'A'))
+            continue
+        (column, sub_part, order) = p.groups()
+        if sub_part is not None:
+            sub_part = long(sub_part)
+        if order and order.strip().upper() == 'DESC':
+            collation = 'D'
+        else:
+            collation = 'A'
+        result.append((unquote_identifier(column), sub_part, collation))
+    return (name, kind, result, index_type)
+
+def parse_create_table(statement):
+    lines = statement.split('\n')
+    m = re.match('CREATE TABLE (?:IF NOT EXISTS )?(%s)' % identifier, lines[0])
+    if m is None:
+        raise error, "Can't parse '%s'." % lines[0]
+    table = unquote_identifier(m.group(1))
+    engine = engine_re.search(lines[-1])
+    if engine and engine.group(1).upper() in ('MEMORY', 'HEAP'):
+        default_index_type = 'HASH'
+    else:
+        default_index_type = 'BTREE'
+    columns = []
+    definitions = {}
+    keys = []
+    for line in lines[1:-1]:
+        line = line.strip()
+        if line[-1:] == ',':
+            line = line[:-1]
+        if line[:1] == '`':
+            n = re.match(identifier, line)
+            name = unquote_identifier(n.group(0))
+            definitions[name] = parse_column(line[n.end():].strip())
+            columns.append(name)
+        else:
+            key = parse_key(line)
+            if key is not None:
+                keys.append(key)
+    return (table, table_rows(table, columns, definitions, keys,
+                              default_index_type))
+
+# Make the 'describe' and 'show index' rows of a table, given a list
+# of its column names, a map from column name to a map as returned by
+# parse_column, and a list of keys as returned by parse_key (in the
+# order MySQL keeps them).  Returns (columns, indexes).
+
+def table_rows(table, columns, definitions, keys, default_index_type='BTREE'):
+    # The primary key is PRIMARY, or if there is none, the first
+    # unique index on columns which cannot be null.
+    primary = None
+    for (name, kind, parts, index_type) in keys:
+        if kind == 'PRIMARY':
+            primary = name
+            break
+    if primary is None:
+        for (name, kind, parts, index_type) in keys:
+            if kind == 'UNIQUE' and not filter(
+                lambda p, d=definitions: p[0] is None or d[p[0]]['Null'] == 'YES',
+                parts):
+                primary = name
+                break
+    # Key shows PRI for columns in the primary key, otherwise UNI for
+    # the column of a single-column unique index, otherwise MUL for the
+    # first column of any other index.
+    column_keys = {}
+    for (name, kind, parts, index_type) in keys:
+        for i in range(len(parts)):
+            column = parts[i][0]
+            if name == primary:
+                column_keys[column] = 'PRI'
+            elif i == 0 and column_keys.get(column) != 'PRI':
+                if kind in ('PRIMARY', 'UNIQUE') and len(parts) == 1:
+                    column_keys[column] = 'UNI'
+                elif not column_keys.has_key(column):
+                    column_keys[column] = 'MUL'
+    column_rows = []
+    for name in columns:
+        d = definitions[name]
+        null = d['Null']
+        if column_keys.get(name) == 'PRI':
+            null = 'NO'
+        row = {}
+        row['Field'] = name
+        row['Type'] = d['Type']
+        row['Null'] = null
+        row['Key'] = column_keys.get(name, '')
+        row['Default'] = d['Default']
+        row['Extra'] = d['Extra']
+        column_rows.append(row)
+    index_rows = []
+    for (name, kind, parts, index_type) in keys:
+        if kind in ('FULLTEXT', 'SPATIAL'):
+            index_type = kind
+        elif index_type is None:
+            index_type = default_index_type
+        for i in range(len(parts)):
+            (column, sub_part, collation) = parts[i]
+            if index_type in ('FULLTEXT', 'HASH'):
+                collation = None
+            if column is not None and definitions[column]['Null'] == 'YES':
+                null = 'YES'
+            else:
+                null = ''
+            row = {}
+            row['Table'] = table
+            row['Non_unique'] = long(kind not in ('PRIMARY', 'UNIQUE'))
+            row['Key_name'] = name
+            row['Seq_in_index'] = long(i + 1)
+            row['Column_name'] = column
+            row['Collation'] = collation
+            row['Cardinality'] = None
+            row['Sub_part'] = sub_part
+            row['Packed'] = None
+            row['Null'] = null
+            row['Index_type'] = index_type
+            row['Comment'] = ''
+            index_rows.append(row)
+    return (column_rows, index_rows)
+
+# 4. Reading a dump.
+#
+# read_dump returns the schema in a dump file as a map from table name
+# to (columns, indexes), as pickle_schema.describe_schema does.  If
+# the dump has more than one database (and so has USE statements),
+# db_name says which one we want.
+
+def read_dump(path, db_name=None):
+    f = open_dump(path)
+    try:
+        schema = {}
+        database = None
+        for statement in dump_statements(f):
+            if statement[:4] == 'USE ':
+                database = unquote_identifier(statement[4:].strip(' ;\r'))
+            elif db_name is None or database is None or database == db_name:
+                (table, rows) = parse_create_table(statement)
+                schema[table] = rows
+        return schema
+    finally:
+        f.close()
+
+# Read the schema from a dump file and write it to a pickle (unless an
+# existing pickle has the same schema), as pickle_schema.pickle_schema
+# does.
+
+def pickle_dump(schema_version, path, db_name=None):
+    schema = read_dump(path, db_name)
+    if not schema:
+        raise error, "No tables found in '%s'." % path
+    name = get_schema.save_schema(schema_version, schema)
+    print get_schema.version_map_entry(schema_version, name)
+    return name
+
+
+# A. REFERENCES
+#
+#
+# B. DOCUMENT HISTORY
+#
+# 2026-10-17 Created.
+#
+#
+# C. COPYRIGHT AND LICENSE
+#
+# This file is copyright (c) 2026 Perforce Software, Inc.  All rights
+# reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1.  Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+# 2.  Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# HOLDERS AND CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS
+# OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR
+# TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGE.
+#
+#
+# $Id$
@@ -11,20 +11,144 @@
 # This module decodes a Python pickle of a Bugzilla schema, and turns
 # it into a consistent data structure which incorporates remarks from
 # schema_remarks.py.  The pickles are originally put in the 'pickles'
-# subdirectory by pickle_schema.py.
+# subdirectory by pickle_schema.py, and are read by schema_store.py.
 #
 # The intended readership is project developers.
 #
 # This document is not confidential.
 
 import cPickle
+from collections import OrderedDict
+from hashlib import md5
+import multiprocessing
+import os
+import sys
 import types
+import weakref
 import schema_remarks
+import schema_store
 import string
 import re
 
 error = 'getting a schema'
 
+# 2. Schema records.
+#
+# A reduced schema is made of Table, Column and Index records.  These
+# use __slots__, so they are much smaller than dictionaries and their
+# fields are quick to get at.  Each record class also has a keys_map
+# from the names used in the generated document ('Name', 'Type', and
+# so on) to its fields, so that a record can be used as a mapping
+# (for instance with '%' formatting).
+#
+# Reduced records are immutable, so that they can be shared (see
+# section 5).  Anything that needs to change a record (for instance
+# make_schema_doc, when it pairs up values with versions) must make
+# its own record.
+
+class mapping_view(object):
+    __slots__ = ()
+    attributes = ()
+    keys_map = {}
+
+    def __getitem__(self, key):
+        return getattr(self, self.keys_map[key])
+
+    def get(self, key, default=None):
+        if self.keys_map.has_key(key):
+            return getattr(self, self.keys_map[key])
+        return default
+
+    def has_key(self, key):
+        return self.keys_map.has_key(key)
+
+    def keys(self):
+        return self.keys_map.keys()
+
+    def values(self):
+        return tuple(map(lambda a, r=self: getattr(r, a), self.attributes))
+
+    def __repr__(self):
+        return '%s%r' % (self.__class__.__name__, self.values())
+
+class record(mapping_view):
+    __slots__ = ('__weakref__',)
+
+    def __setattr__(self, name, value):
+        raise TypeError, "Schema records are read-only."
+
+    def __delattr__(self, name):
+        raise TypeError, "Schema records are read-only."
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                self.values() == other.values())
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (self.__class__, self.values())
+
+# A column: see reduce_columns.
+
+class Column(record):
+    __slots__ = ('name', 'default', 'type', 'properties', 'remarks')
+    attributes = __slots__
+    keys_map = {'Name': 'name',
+                'Default': 'default',
+                'Type': 'type',
+                'Properties': 'properties',
+                'Remarks': 'remarks'}
+
+    def __init__(self, name, default, type, properties, remarks):
+        init = object.__setattr__
+        init(self, 'name', name)
+        init(self, 'default', default)
+        init(self, 'type', type)
+        init(self, 'properties', properties)
+        init(self, 'remarks', remarks)
+
+# An index: see reduce_indexes.
+
+class Index(record):
+    __slots__ = ('name', 'fields', 'properties', 'remarks')
+    attributes = __slots__
+    keys_map = {'Name': 'name',
+                'Fields': 'fields',
+                'Properties': 'properties',
+                'Remarks': 'remarks'}
+
+    def __init__(self, name, fields, properties, remarks):
+        init = object.__setattr__
+        init(self, 'name', name)
+        init(self, 'fields', fields)
+        init(self, 'properties', properties)
+        init(self, 'remarks', remarks)
+
+# A table: maps from name to Column and from name to Index.  A Table
+# can also be unpacked, or indexed, as the pair (columns, indexes).
+
+class Table(record):
+    __slots__ = ('columns', 'indexes')
+    attributes = __slots__
+
+    def __init__(self, columns, indexes):
+        init = object.__setattr__
+        init(self, 'columns', columns)
+        init(self, 'indexes', indexes)
+
+    def __iter__(self):
+        return iter((self.columns, self.indexes))
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, i):
+        return (self.columns, self.indexes)[i]
+
 # 3. Obtaining a schema, and reducing it to a normal form.
 
 # This is a map from type names (as returned by a 'describe'
@@ -39,13 +163,13 @@ type_map={
     }
 
 # Given output from a 'describe table' operation, return a map from
-# column name to a map with the following entries:
+# column name to a Column with the following entries:
 # 
 # 'Name':       column name,
 # 'Default':    default value (or "None"),
 # 'Type':       type name,
 # 'Properties': properties (e.g. auto_increment).
-# 'Remarks'   : list of HTML remarks
+# 'Remarks'   : tuple of HTML remarks
 #
 # Because almost all columns are "NOT NULL", that is the default, and
 # other columns are marked 'null' under 'Properties'.
@@ -97,27 +221,22 @@ def reduce_columns(table, description, errors):
         else:
             remark = schema_remarks.column_remark[table][canonical_name]
         if remark is None:
-            remarks=[]
+            remarks=()
         elif type(remark) == types.ListType:
-            remarks=remark
+            remarks=tuple(remark)
         else:
-            remarks=[remark]
-        columns[canonical_name] = {
-            'Name': name,
-            'Default': default,
-            'Type': sqltype,
-            'Properties': extra,
-            'Remarks': remarks,
-            }
+            remarks=(remark,)
+        columns[canonical_name] = Column(name, default, sqltype, extra,
+                                         remarks)
     return columns
 
-# Given output from "show index", return a map from index name to a
-# map with the following entries:
+# Given output from "show index", return a map from index name to an
+# Index with the following entries:
 #
 # 'Name':    Index name, 'PRIMARY' for a primary index;
 # 'Fields':  A string containing the ordered column names;
 # 'Properties':  A string with such properties as 'unique' and 'full text'
-# 'Remarks': A list of remarks.
+# 'Remarks': A tuple of remarks.
 
 foreign_key_index_re=re.compile('^fk_.*')
 
@@ -151,36 +270,831 @@ def reduce_indexes(table, index_list, errors):
             else:
                 remark = schema_remarks.index_remark[table][canon]
             if remark:
-                remarks = [remark]
+                remarks = (remark,)
             else:
-                remarks = []
+                remarks = ()
             indexes[canon] = {'Name': kn,
                               'Fields': {i['Seq_in_index']: i['Column_name']},
                               'Properties': props,
                               'Remarks': remarks,
                               }
-    # replace the 'Fields' map with an ordered list.
+    # make the Index records, with the 'Fields' map as an ordered list.
     for k in indexes.keys():
-        f = indexes[k]['Fields'].items()
+        i = indexes[k]
+        f = i['Fields'].items()
         f.sort()
-        indexes[k]['Fields'] = string.join(map((lambda l: l[1]), f), ', ')
+        indexes[k] = Index(i['Name'],
+                           string.join(map((lambda l: l[1]), f), ', '),
+                           i['Properties'],
+                           i['Remarks'])
     return indexes
 
+# Reduce one raw table, returning (columns, indexes, errors).
+
+def reduce_table(table, raw_table):
+    (columns, indexes) = raw_table
+    errors = []
+    return (reduce_columns(table, columns, errors),
+            reduce_indexes(table, indexes, errors),
+            errors)
+
+# Reducing a table with no remarks gives it an empty map of remarks in
+# schema_remarks, which make_schema_doc relies on.  A table reduced
+# from the cache needs the same treatment.
+
+def ensure_table_remarks(table):
+    if not schema_remarks.column_remark.has_key(table):
+        schema_remarks.column_remark[table] = {}
+    if not schema_remarks.index_remark.has_key(table):
+        schema_remarks.index_remark[table] = {}
+
+# 4. Caching reduced schemas.
+#
+# A reduced schema depends only on its pickle (whose hash we get from
+# the manifest, see schema_store.py), on schema_remarks.py, and on
+# this module.  So we keep each reduced schema in a file in
+# reduced_cache_dir, and reuse it until one of those changes.  A cache
+# file is a pickled map with these entries:
+#
+#   'key':     (pickle hash, remarks hash), where the remarks hash
+#              covers schema_remarks.py and this module;
+#   'tables':  the names of the tables, in the order they were reduced;
+#   'reduced': a map from table name to (columns, indexes, errors), as
+#              returned by reduce_table.
+#
+# Cache files are written atomically, so concurrent CGI processes can
+# share them.  Failing to read or write a cache file just means that
+# the schema is reduced again.  Set reduced_cache_dir to None to turn
+# the cache off.
+
+reduced_cache_dir = 'cache'
+
+the_remarks_hash = None
+
+def remarks_hash():
+    global the_remarks_hash
+    if the_remarks_hash is None:
+        the_remarks_hash = (schema_store.source_hash(schema_remarks) +
+                            schema_store.source_hash(sys.modules[__name__]))
+    return the_remarks_hash
+
+def reduced_cache_path(schema_version):
+    return os.path.join(reduced_cache_dir, 'reduced-%s' % schema_version)
+
+def reduced_cache_key(schema_version):
+    return (schema_store.schema_hash(schema_version), remarks_hash())
+
+# Return the cached reduced schema, or None.
+
+def read_reduced_cache(schema_version, key):
+    if reduced_cache_dir is None:
+        return None
+    try:
+        f = open(reduced_cache_path(schema_version), 'rb')
+        try:
+            entry = cPickle.load(f)
+        finally:
+            f.close()
+    except (IOError, EOFError, cPickle.UnpicklingError):
+        return None
+    if entry.get('key') != key:
+        return None
+    for table in entry['tables']:
+        ensure_table_remarks(table)
+    return entry
+
+def write_reduced_cache(schema_version, entry):
+    if reduced_cache_dir is None:
+        return
+    try:
+        if not os.path.isdir(reduced_cache_dir):
+            os.makedirs(reduced_cache_dir)
+        schema_store.write_atomically(reduced_cache_path(schema_version),
+                                      cPickle.dumps(entry, 2))
+    except (IOError, OSError):
+        pass
+
+# Return the reduced schema, as a cache entry, from the cache if
+# possible.
+
+def reduce_schema(schema_version):
+    key = reduced_cache_key(schema_version)
+    entry = read_reduced_cache(schema_version, key)
+    if entry is None:
+        (sv, schema) = schema_store.load_schema(schema_version)
+        tables = schema.keys()
+        reduced = {}
+        for table in tables:
+            reduced[table] = reduce_table(table, schema[table])
+        entry = {'key': key, 'tables': tables, 'reduced': reduced}
+        write_reduced_cache(schema_version, entry)
+    return entry
+
+# 5. Sharing schema records.
+#
+# Reduced schemas are shared: between renders in one process, through
+# the schema cache (section 6), and between schema versions.  So once
+# reduced, the maps for columns, indexes and schemas are frozen too.
+
+class frozen_dict(dict):
+    def read_only(self, *args, **kwargs):
+        raise TypeError, "Schema records are read-only."
+    __setitem__ = read_only
+    __delitem__ = read_only
+    clear = read_only
+    pop = read_only
+    popitem = read_only
+    setdefault = read_only
+    update = read_only
+
+    def __reduce__(self):
+        return (frozen_dict, (dict(self),))
+
+# Because records are immutable, identical ones can be shared.  When
+# hash_cons is true, freezing a record looks it up in canonical_records
+# and returns the existing record if there is one, with all its
+# strings interned.  The same goes for the maps of all the columns or
+# all the indexes of a table, and for tables.  So a column which is
+# the same in forty schemas is one object, not forty, and an unchanged
+# table is one object too.  The canonical records are held weakly, so
+# they go when no schema uses them.
+
+hash_cons = True
+
+canonical_records = weakref.WeakValueDictionary()
+
+def intern_value(v):
+    if type(v) == types.StringType:
+        return intern(v)
+    return v
+
+# Return the canonical record for key, or None.
+
+def find_canonical(key):
+    try:
+        return canonical_records.get(key)
+    except TypeError:
+        # unhashable remarks; can't share this record.
+        return None
+
+def make_canonical(key, record):
+    try:
+        canonical_records[key] = record
+    except TypeError:
+        pass
+    return record
+
+def freeze_record(record):
+    if not hash_cons:
+        return record
+    values = record.values()
+    key = (record.__class__,) + values
+    c = find_canonical(key)
+    if c is None:
+        c = make_canonical(key, record.__class__(*map(intern_value, values)))
+    return c
+
+def freeze_records(records):
+    frozen = {}
+    for (name, record) in records.items():
+        frozen[name] = freeze_record(record)
+    if not hash_cons:
+        return frozen_dict(frozen)
+    # the records are canonical, so their identities will do.
+    items = [(k, id(v)) for (k, v) in frozen.items()]
+    items.sort()
+    key = ('records',) + tuple(items)
+    c = find_canonical(key)
+    if c is None:
+        interned = {}
+        for (k, v) in frozen.items():
+            interned[intern(k)] = v
+        c = make_canonical(key, frozen_dict(interned))
+    return c
+
+def freeze_table(columns, indexes):
+    columns = freeze_records(columns)
+    indexes = freeze_records(indexes)
+    if not hash_cons:
+        return Table(columns, indexes)
+    key = (Table, id(columns), id(indexes))
+    c = find_canonical(key)
+    if c is None:
+        c = make_canonical(key, Table(columns, indexes))
+    return c
+
+# Freeze a reduced schema (as made by reduce_schema), and add the
+# schema map which get_schema returns.
+
+def freeze_schema(entry):
+    reduced = {}
+    schema = {}
+    for table in entry['tables']:
+        (columns, indexes, errors) = entry['reduced'][table]
+        t = freeze_table(columns, indexes)
+        reduced[table] = (t, tuple(errors))
+        schema[table] = t
+    return {'tables': tuple(entry['tables']),
+            'reduced': frozen_dict(reduced),
+            'schema': frozen_dict(schema)}
+
+# 6. The schema cache.
+#
+# A long-lived process keeps the most recently used frozen schemas in
+# memory, so that a warm process never re-reads or re-reduces a
+# schema, and gets the same schema object each time it asks for the
+# same version.
+
+class lru_cache:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if self.entries.has_key(key):
+            self.hits = self.hits + 1
+            value = self.entries.pop(key)
+            self.entries[key] = value
+            return value
+        self.misses = self.misses + 1
+        return None
+
+    def has_key(self, key):
+        return self.entries.has_key(key)
+
+    def put(self, key, value):
+        if self.entries.has_key(key):
+            del self.entries[key]
+        self.entries[key] = value
+        while len(self.entries) > max(self.size, 0):
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {'size': self.size,
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses}
+
+# Set schema_cache.size to change the number of schemas kept; 0 turns
+# the cache off.
+
+schema_cache = lru_cache(64)
+
+# 7. Getting a schema.
+#
 # Given a schema version name, get the schema for that database as a
-# map from table name to (columns, indexes), where columns is a map
-# produced by reduce_columns and indexes is a map produced by
-# reduce_indexes.
-
-def get_schema(schema_version, errors):
-    f = open('pickles/%s' % schema_version, 'r')
-    (sv, schema) = cPickle.load(f)
-    f.close()
-    tables = schema.keys()
+# map from table name to a Table of (columns, indexes), where columns
+# is a map produced by reduce_columns and indexes is a map produced by
+# reduce_indexes, all frozen.  If tables is given, only those tables
+# (of the ones in the schema) are in the map.
+#
+# If the whole schema is in the schema cache, that is what we get.
+# Otherwise we get a lazy_schema, which reads and reduces each table
+# the first time it is asked for, so that a caller which looks at a
+# few tables (a column's history, say) costs time and memory in
+# proportion to those tables and not to the whole schema.  Call
+# load_schema_entry (or get_schemas) to get whole schemas eagerly.
+
+def get_schema(schema_version, errors, tables=None):
+    if schema_cache.has_key(schema_version):
+        entry = schema_cache.get(schema_version)
+        return entry_schema(entry, errors, tables), errors
+    return lazy_schema(schema_version, errors, tables), errors
+
+# Return the schema from a frozen entry, adding the errors found when
+# reducing it to errors.
+
+def entry_schema(entry, errors, tables=None):
+    if tables is None:
+        for table in entry['tables']:
+            errors.extend(entry['reduced'][table][1])
+        return entry['schema']
+    schema = {}
+    for table in entry['tables']:
+        if table in tables:
+            (t, e) = entry['reduced'][table]
+            errors.extend(e)
+            schema[table] = t
+    return schema
+
+# Return the frozen entry for a whole schema: from the schema cache,
+# or else reduced (or read from the disk cache), frozen, and added to
+# the schema cache.
+
+def load_schema_entry(schema_version):
+    entry = schema_cache.get(schema_version)
+    if entry is None:
+        entry = freeze_schema(reduce_schema(schema_version))
+        schema_cache.put(schema_version, entry)
+    return entry
+
+# Tables reduced one at a time are kept in their own cache, as
+# (Table, errors) keyed by (schema version, table name).  Set
+# table_cache.size to 0 to turn it off.  If raw_schema is given, the
+# table is taken from it rather than loaded.
+
+table_cache = lru_cache(1024)
+
+def reduced_table(schema_version, table, raw_schema=None):
+    key = (schema_version, table)
+    reduced = table_cache.get(key)
+    if reduced is None:
+        if raw_schema is None:
+            raw = schema_store.load_table(schema_version, table)
+        else:
+            raw = raw_schema.get(table)
+        if raw is None:
+            return None
+        (columns, indexes, errors) = reduce_table(table, raw)
+        reduced = (freeze_table(columns, indexes), tuple(errors))
+        table_cache.put(key, reduced)
+    return reduced
+
+# A lazy_schema behaves like the map returned by entry_schema, but
+# only knows the names of its tables until they are asked for.  The
+# errors found when reducing a table are added to errors when that
+# table is first got from this schema.  Looking at every table (with
+# items or values) reduces the whole schema in one go, and adds it to
+# the schema cache.
+#
+# Only the archive can load one table at a time.  From anywhere else,
+# the raw schema is loaded once, when its table names are first
+# wanted, and kept in raw for the tables reduced from it.
+
+class lazy_schema:
+    def __init__(self, schema_version, errors, tables=None):
+        self.schema_version = schema_version
+        self.errors = errors
+        self.wanted = tables
+        self.names = None
+        self.tables = {}
+        self.raw = None
+
+    def keys(self):
+        if self.names is None:
+            if schema_store.has_tables(self.schema_version):
+                names = schema_store.load_table_names(self.schema_version)
+            else:
+                self.raw = schema_store.load_schema(self.schema_version)[1]
+                names = self.raw.keys()
+            if self.wanted is not None:
+                names = filter(lambda t, w=self.wanted: t in w, names)
+            self.names = list(names)
+        return self.names[:]
+
+    def has_key(self, table):
+        if self.names is None:
+            self.keys()
+        return table in self.names
+
+    __contains__ = has_key
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __getitem__(self, table):
+        if self.tables.has_key(table):
+            return self.tables[table]
+        if not self.has_key(table):
+            raise KeyError, table
+        if schema_cache.has_key(self.schema_version):
+            entry = schema_cache.get(self.schema_version)
+            (t, errors) = entry['reduced'][table]
+        else:
+            (t, errors) = reduced_table(self.schema_version, table,
+                                        self.raw)
+        self.errors.extend(errors)
+        self.tables[table] = t
+        return t
+
+    def get(self, table, default=None):
+        if self.has_key(table):
+            return self[table]
+        return default
+
+    def load(self):
+        entry = load_schema_entry(self.schema_version)
+        for table in self.keys():
+            if not self.tables.has_key(table):
+                (t, errors) = entry['reduced'][table]
+                self.errors.extend(errors)
+                self.tables[table] = t
+
+    def items(self):
+        self.load()
+        return map(lambda t, s=self: (t, s.tables[t]), self.keys())
+
+    def values(self):
+        self.load()
+        return map(lambda t, s=self: s.tables[t], self.keys())
+
+# Get a single table from a schema version, as a Table, or None if the
+# table is not in that schema.
+
+def get_table(schema_version, table, errors):
+    schema, errors = get_schema(schema_version, errors, [table])
+    return schema.get(table)
+
+# 8. Getting several schemas.
+#
+# get_schemas returns a list of the whole schemas for a list of schema
+# versions.  Schemas which are not in the schema cache can be read and
+# reduced in parallel by a pool of worker processes (if processes is
+# more than 1).  They come back as plain reduced schemas, are frozen
+# here (so that they share records with the schemas we already have),
+# are added to the schema cache, and are returned in the order asked
+# for, just as if we had reduced them one after another.
+
+def reduced_entry(schema_version):
+    return reduce_schema(schema_version)
+
+# The pool is kept for the life of the process, and made again only
+# if a different number of processes is wanted; the_pool_processes is
+# the number it was made with.
+
+the_pool = None
+the_pool_processes = None
+
+def get_pool(processes):
+    global the_pool, the_pool_processes
+    if the_pool is None or the_pool_processes != processes:
+        if the_pool is not None:
+            the_pool.terminate()
+        the_pool = multiprocessing.Pool(processes)
+        the_pool_processes = processes
+    return the_pool
+
+def get_schemas(schema_versions, errors, processes=0):
+    fetched = {}
+    if processes > 1:
+        missing = []
+        for v in schema_versions:
+            if not schema_cache.has_key(v) and v not in missing:
+                missing.append(v)
+        if len(missing) > 1:
+            entries = get_pool(processes).map(reduced_entry, missing)
+            for (v, entry) in zip(missing, entries):
+                # The workers, not us, gave these tables empty remarks.
+                for table in entry['tables']:
+                    ensure_table_remarks(table)
+                entry = freeze_schema(entry)
+                schema_cache.put(v, entry)
+                fetched[v] = entry
+    schemas = []
+    for v in schema_versions:
+        if fetched.has_key(v):
+            entry = fetched[v]
+        else:
+            entry = load_schema_entry(v)
+        schemas.append(entry_schema(entry, errors))
+    return schemas
+
+# 9. Fingerprints.
+#
+# A schema's fingerprint is an MD5 hash of its reduced tables, leaving
+# out the remarks.  Two schemas with the same fingerprint make the
+# same schema doc, so a newly captured schema whose fingerprint
+# matches an existing pickle does not need a pickle of its own: its
+# version can use the existing one in
+# schema_remarks.version_schema_map.
+#
+# The fingerprint index, in fingerprint_index_path, holds the
+# fingerprint of every pickle, so that a new schema is checked against
+# all of them with one lookup.  It is a pickled map with these
+# entries:
+#
+#   'key':          the remarks hash (see section 4) it was made with;
+#   'hashes':       a map from pickle name to the hash of the pickle;
+#   'fingerprints': a map from pickle name to fingerprint.
+#
+# It is brought up to date when first used in a process, by
+# fingerprinting only those pickles whose hashes have changed (and
+# those come from the reduced schema cache if they can).  It is not
+# kept in Git.
+
+fingerprint_index_path = 'pickles.fingerprints'
+
+# The fingerprint of a reduced schema: a map from table name to
+# (columns, indexes, errors), as in a reduced schema cache entry.  A
+# record's remarks are its last field.
+
+def reduced_fingerprint(reduced):
+    tables = reduced.keys()
+    tables.sort()
+    canonical = []
     for table in tables:
-        (columns, indexes) = schema[table]
-        schema[table] = (reduce_columns(table, columns, errors),
-                         reduce_indexes(table, indexes, errors))
-    return schema, errors
+        (columns, indexes, errors) = reduced[table]
+        for records in (columns, indexes):
+            names = records.keys()
+            names.sort()
+            canonical.append((table, map(lambda n, r=records:
+                                         r[n].values()[:-1], names)))
+    return md5(repr(canonical)).hexdigest()
+
+# The fingerprint of a raw schema, as captured.
+
+def schema_fingerprint(schema):
+    reduced = {}
+    for table in schema.keys():
+        reduced[table] = reduce_table(table, schema[table])
+    return reduced_fingerprint(reduced)
+
+def pickle_fingerprint(schema_version):
+    return reduced_fingerprint(reduce_schema(schema_version)['reduced'])
+
+# The pickles to fingerprint: those in the manifest, if there is one.
+
+def fingerprint_names():
+    manifest = schema_store.get_manifest()
+    if manifest:
+        names = manifest.keys()
+        names.sort()
+        return names
+    return schema_store.pickle_names()
+
+# The index is read and brought up to date at most once per process.
+# In memory, it also has the entry 'names': a map from fingerprint to
+# pickle name.  Where pickles share a fingerprint, the name is the
+# first in version order.
+
+the_fingerprint_index = None
+
+def write_fingerprint_index(index):
+    data = {'key': index['key'],
+            'hashes': index['hashes'],
+            'fingerprints': index['fingerprints']}
+    try:
+        schema_store.write_atomically(fingerprint_index_path,
+                                      cPickle.dumps(data, 2))
+    except (IOError, OSError):
+        pass
+
+def index_fingerprint_names(index):
+    names = {}
+    order = schema_store.schema_names()
+    others = filter(lambda n, o=order: n not in o,
+                    index['fingerprints'].keys())
+    others.sort()
+    for name in order + others:
+        fingerprint = index['fingerprints'].get(name)
+        if fingerprint is not None and not names.has_key(fingerprint):
+            names[fingerprint] = name
+    index['names'] = names
+
+def get_fingerprint_index():
+    global the_fingerprint_index
+    if the_fingerprint_index is not None:
+        return the_fingerprint_index
+    index = None
+    try:
+        f = open(fingerprint_index_path, 'rb')
+        try:
+            index = cPickle.load(f)
+        finally:
+            f.close()
+    except (IOError, EOFError, cPickle.UnpicklingError):
+        pass
+    if index is None or index.get('key') != remarks_hash():
+        index = {'key': remarks_hash(), 'hashes': {}, 'fingerprints': {}}
+    changed = 0
+    names = fingerprint_names()
+    for name in index['hashes'].keys():
+        if name not in names:
+            del index['hashes'][name]
+            del index['fingerprints'][name]
+            changed = 1
+    for name in names:
+        digest = schema_store.schema_hash(name)
+        if index['hashes'].get(name) != digest:
+            index['fingerprints'][name] = pickle_fingerprint(name)
+            index['hashes'][name] = digest
+            changed = 1
+    if changed:
+        write_fingerprint_index(index)
+    index_fingerprint_names(index)
+    the_fingerprint_index = index
+    return index
+
+def reset_fingerprint_index():
+    global the_fingerprint_index
+    the_fingerprint_index = None
+
+# Return the name of the pickle whose schema has this fingerprint, or
+# None.
+
+def find_fingerprint(fingerprint):
+    return get_fingerprint_index()['names'].get(fingerprint)
+
+# 10. Saving a captured schema.
+#
+# save_schema saves a newly captured schema as schema_version, unless
+# an existing pickle has the same fingerprint.  Either way, it returns
+# the name of the pickle which schema_version should be mapped to in
+# schema_remarks.version_schema_map.  If manifest is false, the
+# caller must regenerate the manifest (for instance after saving
+# several schemas).
+#
+# physical is the schema's physical metadata, or None.  It is not part
+# of the fingerprint, but it is kept for the existing pickle if that
+# has none.
+
+def save_schema(schema_version, schema, manifest=True, physical=None):
+    fingerprint = schema_fingerprint(schema)
+    index = get_fingerprint_index()
+    name = index['names'].get(fingerprint)
+    if name is not None:
+        if physical is not None and schema_store.load_physical(name) is None:
+            schema_store.write_physical(name, physical)
+        return name
+    schema_store.write_pickle(schema_version, schema)
+    if physical is not None:
+        schema_store.write_physical(schema_version, physical)
+    elif os.path.exists(schema_store.physical_path(schema_version)):
+        os.remove(schema_store.physical_path(schema_version))
+    if manifest:
+        schema_store.write_manifest()
+    index['hashes'][schema_version] = schema_store.pickle_hash(schema_version)
+    index['fingerprints'][schema_version] = fingerprint
+    write_fingerprint_index(index)
+    index_fingerprint_names(index)
+    return schema_version
+
+# The line to add to schema_remarks.version_schema_map.
+
+def version_map_entry(schema_version, name):
+    return "    '%s': '%s'," % (schema_version, name)
+
+# 11. Physical metadata.
+#
+# get_physical returns a schema's physical metadata as a map from
+# table name to a Storage record with these fields:
+#
+#   engine, row_format, collation: as captured (see schema_store.py,
+#       section 7), or None if the schema has no physical metadata;
+#   column_collations: a map from column name to collation;
+#   index_parts: a map from index name to a tuple of (column name,
+#       sub part, cardinality), one for each column of the index, from
+#       the raw 'show index' rows, so known for every schema.  Unlike
+#       the indexes of a reduced schema, this includes the indexes
+#       which InnoDB makes for foreign keys;
+#   foreign_keys: a map from constraint name to a ForeignKey.
+#
+# An index whose sub part is not None indexes only a prefix of that
+# column.
+
+class ForeignKey(record):
+    __slots__ = ('name', 'columns', 'referenced_table',
+                 'referenced_columns', 'on_update', 'on_delete')
+    attributes = __slots__
+    keys_map = {'Name': 'name',
+                'Columns': 'columns',
+                'Referenced_table': 'referenced_table',
+                'Referenced_columns': 'referenced_columns',
+                'On_update': 'on_update',
+                'On_delete': 'on_delete'}
+
+    def __init__(self, name, columns, referenced_table,
+                 referenced_columns, on_update, on_delete):
+        init = object.__setattr__
+        init(self, 'name', name)
+        init(self, 'columns', columns)
+        init(self, 'referenced_table', referenced_table)
+        init(self, 'referenced_columns', referenced_columns)
+        init(self, 'on_update', on_update)
+        init(self, 'on_delete', on_delete)
+
+class Storage(record):
+    __slots__ = ('engine', 'row_format', 'collation', 'column_collations',
+                 'index_parts', 'foreign_keys')
+    attributes = __slots__
+    keys_map = {'Engine': 'engine',
+                'Row_format': 'row_format',
+                'Collation': 'collation',
+                'Column_collations': 'column_collations',
+                'Index_parts': 'index_parts',
+                'Foreign_keys': 'foreign_keys'}
+
+    def __init__(self, engine, row_format, collation, column_collations,
+                 index_parts, foreign_keys):
+        init = object.__setattr__
+        init(self, 'engine', engine)
+        init(self, 'row_format', row_format)
+        init(self, 'collation', collation)
+        init(self, 'column_collations', column_collations)
+        init(self, 'index_parts', index_parts)
+        init(self, 'foreign_keys', foreign_keys)
+
+def reduce_index_parts(index_list):
+    parts = {}
+    for i in index_list:
+        parts.setdefault(i['Key_name'], []).append(
+            (i['Seq_in_index'], (i['Column_name'], i.get('Sub_part'),
+                                 i.get('Cardinality'))))
+    for (name, p) in parts.items():
+        p.sort()
+        parts[name] = tuple(map(lambda x: x[1], p))
+    return frozen_dict(parts)
+
+def reduce_foreign_keys(rows):
+    keys = {}
+    for r in rows:
+        keys.setdefault(r['Constraint_name'], []).append(r)
+    for (name, rs) in keys.items():
+        rs.sort(lambda a, b: cmp(a['Ordinal_position'],
+                                 b['Ordinal_position']))
+        keys[name] = ForeignKey(name,
+                                tuple(map(lambda r: r['Column_name'], rs)),
+                                rs[0]['Referenced_table'],
+                                tuple(map(lambda r: r['Referenced_column'],
+                                          rs)),
+                                rs[0]['On_update'], rs[0]['On_delete'])
+    return frozen_dict(keys)
+
+def reduce_physical(schema, physical):
+    storage = {}
+    for (table, (columns, indexes)) in schema.items():
+        p = physical.get(table, {})
+        storage[table] = Storage(p.get('Engine'), p.get('Row_format'),
+                                 p.get('Collation'),
+                                 frozen_dict(p.get('Columns', {})),
+                                 reduce_index_parts(indexes),
+                                 reduce_foreign_keys(p.get('Foreign_keys',
+                                                           [])))
+    return frozen_dict(storage)
+
+physical_cache = lru_cache(16)
+
+def get_physical(schema_version):
+    storage = physical_cache.get(schema_version)
+    if storage is None:
+        (sv, schema) = schema_store.load_schema(schema_version)
+        physical = schema_store.load_physical(schema_version) or {}
+        storage = reduce_physical(schema, physical)
+        physical_cache.put(schema_version, storage)
+    return storage
+
+# 12. Production sizes.
+#
+# get_sizes returns the sizes recorded for a schema by
+# pickle_schema.pickle_sizes (see schema_store.py, section 8), as a
+# map from table name to a Size record, or None if there are none.
+# The indexes of a Size map the canonical name of each index (as in a
+# reduced schema) to its cardinality.  get_sizes_version returns the
+# Bugzilla version the sizes were captured from, or None if that was
+# not recorded.
+
+class Size(record):
+    __slots__ = ('rows', 'data_length', 'index_length', 'indexes')
+    attributes = __slots__
+    keys_map = {'Rows': 'rows',
+                'Data_length': 'data_length',
+                'Index_length': 'index_length',
+                'Indexes': 'indexes'}
+
+    def __init__(self, rows, data_length, index_length, indexes):
+        init = object.__setattr__
+        init(self, 'rows', rows)
+        init(self, 'data_length', data_length)
+        init(self, 'index_length', index_length)
+        init(self, 'indexes', indexes)
+
+def reduce_sizes(sizes):
+    reduced = {}
+    for (table, s) in sizes.items():
+        renamed = schema_remarks.index_renamed.get(table, {})
+        indexes = {}
+        for (index, cardinality) in s['Indexes'].items():
+            indexes[renamed.get(index, index)] = cardinality
+        reduced[table] = Size(s['Rows'], s['Data_length'],
+                              s['Index_length'], frozen_dict(indexes))
+    return frozen_dict(reduced)
+
+sizes_cache = lru_cache(16)
+
+def load_sizes_entry(schema_version):
+    if sizes_cache.has_key(schema_version):
+        return sizes_cache.get(schema_version)
+    entry = schema_store.load_sizes(schema_version)
+    if entry is None:
+        entry = (None, None)
+    else:
+        entry = (entry[0], reduce_sizes(entry[1]))
+    sizes_cache.put(schema_version, entry)
+    return entry
+
+def get_sizes(schema_version):
+    return load_sizes_entry(schema_version)[1]
+
+def get_sizes_version(schema_version):
+    return load_sizes_entry(schema_version)[0]
 
 # A. REFERENCES
 #
@@ -188,6 +1102,10 @@ def get_schema(schema_version, errors):
 # B. DOCUMENT HISTORY
 #
 # 2004-11-11 NB  Created, partly from make_schema_doc.py.
+# 2026-10-17     Load schemas through schema_store.py.  Cache reduced
+#                schemas on disk and in memory, as immutable records.
+#                Fingerprint schemas, so that capture keeps no duplicates.
+#                Expose physical metadata and production sizes.
 # 
 #
 # C. COPYRIGHT AND LICENSE
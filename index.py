@@ -267,7 +267,7 @@ class schema_webpage(webpage):
         if not version:
             raise error, (400, 'Bad form parameters',
                           'No %s parameter.' % param)
-        if not (version in schema_remarks.version_order):
+        if not make_schema_doc.get_version_registry().known(version):
             raise error, (404, 'No such Bugzilla version',
                           'No such Bugzilla version: %s.'
                           % version)
@@ -278,8 +278,8 @@ class schema_webpage(webpage):
 
     def check_bugzilla_to(self):
         v = self.check_bugzilla_version('to')
-        if (schema_remarks.version_order.index(v) >=
-            schema_remarks.version_order.index(self.from_version)):
+        registry = make_schema_doc.get_version_registry()
+        if registry.position(v) >= registry.position(self.from_version):
             self.to_version = v
         else:
             self.to_version = self.from_version
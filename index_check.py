@@ -0,0 +1,424 @@
+#             Perforce Defect Tracking Integration Project
+#              <http://www.ravenbrook.com/project/p4dti/>
+#
+#          INDEX_CHECK.PY -- FIND CANDIDATE INDEXES TO REMOVE
+#
+#             Ravenbrook Limited, 2026-10-17
+#
+#
+# 1. INTRODUCTION
+#
+# This module checks the indexes of the Bugzilla schemas from one
+# version to another, and lists those which look redundant:
+#
+#   'duplicate':  an index on the same fields, in the same order, as
+#                 another (where one is unique, the other is the
+#                 duplicate);
+#   'prefix':     a non-unique index whose fields are the first fields
+#                 of another index, which can do its work;
+#   'primary':    a unique index which includes all the fields of the
+#                 primary key, and so is unique anyway.
+#
+# Each is only a candidate: an index may be there for a reason the
+# schema does not show (such as prefix lengths, which the reduced
+# schema leaves out).  Full text indexes are only compared with each
+# other.
+#
+# It also lists the foreign keys which have no index, taking the
+# foreign keys from the column remarks in schema_remarks.py (see
+# section 4).  Joining on such a column, or deleting a row which it
+# refers to, has to scan the table.  For instance:
+#
+#   python index_check.py 2.16 3.4.2
+#
+# The intended readership is project developers and site
+# administrators.
+#
+# This document is not confidential.
+
+import cPickle
+import os
+import re
+import string
+import sys
+import types
+
+import get_schema
+import make_schema_doc
+import schema_remarks
+import schema_store
+
+error = 'checking indexes'
+
+# 2. Finding redundant indexes in a table.
+#
+# We put the indexes of a table in a trie keyed by their fields, so
+# that each index is compared only with the indexes which share its
+# leading fields.  A node of the trie is a pair (indexes, children),
+# where indexes is a list of the names of the indexes whose fields end
+# at that node, and children maps the next field to a node.
+
+def index_fields(index):
+    return tuple(string.split(index.fields, ', '))
+
+def is_unique(index):
+    return index.name == 'PRIMARY' or 'unique' in index.properties
+
+def is_full_text(index):
+    return 'full text' in index.properties
+
+def make_trie(indexes, names):
+    root = ([], {})
+    for name in names:
+        node = root
+        for field in index_fields(indexes[name]):
+            if not node[1].has_key(field):
+                node[1][field] = ([], {})
+            node = node[1][field]
+        node[0].append(name)
+    return root
+
+# The names of the indexes below a node.
+
+def trie_indexes(node):
+    found = []
+    keys = node[1].keys()
+    keys.sort()
+    for k in keys:
+        child = node[1][k]
+        found.extend(child[0])
+        found.extend(trie_indexes(child))
+    return found
+
+# Return a list of (kind, index name, names of the other indexes) for
+# one table's indexes.
+
+def redundant_indexes(indexes):
+    findings = []
+    btree = filter(lambda n, i=indexes: not is_full_text(i[n]), indexes.keys())
+    full_text = filter(lambda n, i=indexes: is_full_text(i[n]), indexes.keys())
+    btree.sort()
+    full_text.sort()
+    for (names, prefixes) in [(btree, 1), (full_text, 0)]:
+        findings.extend(trie_findings(indexes, make_trie(indexes, names),
+                                      prefixes))
+    if indexes.has_key('PRIMARY'):
+        primary = index_fields(indexes['PRIMARY'])
+        for name in btree:
+            i = indexes[name]
+            if (name != 'PRIMARY' and is_unique(i) and
+                index_fields(i) != primary and
+                not filter(lambda f, fs=index_fields(i): f not in fs,
+                           primary)):
+                findings.append(('primary', name, ('PRIMARY',)))
+    return findings
+
+def trie_findings(indexes, node, prefixes):
+    findings = []
+    here = node[0]
+    if len(here) > 1:
+        # Keep a unique index (the primary key first) over the others.
+        keep = filter(lambda n, i=indexes: is_unique(i[n]), here)
+        if 'PRIMARY' in keep:
+            keep = ['PRIMARY']
+        keep = (keep or here)[0]
+        for name in here:
+            if name != keep:
+                findings.append(('duplicate', name, (keep,)))
+    if prefixes and node[1]:
+        longer = trie_indexes(node)
+        for name in here:
+            if not is_unique(indexes[name]):
+                findings.append(('prefix', name, tuple(longer)))
+    keys = node[1].keys()
+    keys.sort()
+    for k in keys:
+        findings.extend(trie_findings(indexes, node[1][k], prefixes))
+    return findings
+
+# 3. Sweeping over the versions.
+#
+# sweep calls findings(bugzilla_version, schema) for each Bugzilla
+# version from first to last, with the reduced schema of that version,
+# and returns a list of each finding (a tuple) with the range of
+# versions in which it is found, as (finding..., first, last).  A
+# finding which comes and goes is listed once for each range.
+
+def sweep(first, last, findings):
+    (bugzilla_versions, changes) = make_schema_doc.schema_changes(first, last)
+    errors = []
+    schemas = {}
+    for (name, schema) in zip(map(lambda c: c[1], changes),
+                              get_schema.get_schemas(map(lambda c: c[1],
+                                                         changes), errors)):
+        schemas[name] = schema
+    current = {}
+    found = []
+    previous = None
+    for v in bugzilla_versions + [None]:
+        seen = {}
+        if v is not None:
+            schema = schemas[schema_remarks.version_schema_map[v]]
+            for finding in findings(v, schema):
+                seen[finding] = 1
+        for (finding, since) in current.items():
+            if not seen.has_key(finding):
+                found.append(finding + (since, previous))
+                del current[finding]
+        for finding in seen.keys():
+            if not current.has_key(finding):
+                current[finding] = v
+        previous = v
+    found.sort()
+    return found
+
+def print_found(found, describe):
+    for finding in found:
+        (since, end) = finding[-2:]
+        if since == end:
+            versions = since
+        else:
+            versions = '%s to %s' % (since, end)
+        print '%s (%s)' % (describe(finding[:-2]), versions)
+
+# Reduced tables are shared between schema versions in which they are
+# the same (see get_schema.py, section 5), so each distinct table is
+# checked only once, however many versions it is in.
+
+def check_table(t, checked):
+    key = id(t)
+    if not checked.has_key(key):
+        checked[key] = (t, redundant_indexes(t.indexes))
+    return checked[key][1]
+
+# Return a list of (table, kind, index name, other index names, first
+# version, last version): each redundant index, and the range of
+# versions in which it is redundant in that way.
+
+def find_redundant_indexes(first, last):
+    checked = {}
+    def findings(v, schema, checked=checked):
+        found = []
+        for table in schema.keys():
+            for (kind, name, others) in check_table(schema[table], checked):
+                found.append((table, kind, name, others))
+        return found
+    return sweep(first, last, findings)
+
+# 4. Foreign keys.
+#
+# The column remarks say which columns are foreign keys, in the form
+# 'foreign key %(column-TABLE-COLUMN)s' (some remarks begin a sentence
+# with 'Foreign key', so case is ignored).  We extract these into a list
+# of edges (table, column, referenced table, referenced column, first,
+# last), where column is the canonical name of the column, and first
+# and last are the versions for which the remark holds (or None), as
+# in a versioned remark (see make_schema_doc.py, section 4).
+#
+# Extracting them means reading every remark, so the edges are kept
+# in a file in get_schema.reduced_cache_dir, and reused until
+# schema_remarks.py or this module changes.
+
+foreign_key_re = re.compile('foreign key %\\(column-([^-)]+)-([^)]+)\\)s',
+                            re.IGNORECASE)
+
+def remark_texts(remark):
+    if type(remark) == types.StringType:
+        return [(None, None, remark)]
+    if type(remark) == types.TupleType:
+        return [remark]
+    texts = []
+    for r in remark:
+        texts.extend(remark_texts(r))
+    return texts
+
+def extract_foreign_keys():
+    edges = []
+    tables = schema_remarks.column_remark.keys()
+    tables.sort()
+    for table in tables:
+        remarks = schema_remarks.column_remark[table]
+        columns = remarks.keys()
+        columns.sort()
+        for column in columns:
+            for (first, last, text) in remark_texts(remarks[column]):
+                for m in foreign_key_re.finditer(text):
+                    edges.append((table, column, m.group(1), m.group(2),
+                                  first, last))
+    return edges
+
+def foreign_keys_cache_path():
+    return os.path.join(get_schema.reduced_cache_dir, 'foreign-keys')
+
+def foreign_keys_key():
+    return (schema_store.source_hash(schema_remarks) +
+            schema_store.source_hash(sys.modules[__name__]))
+
+the_foreign_keys = None
+
+def get_foreign_keys():
+    global the_foreign_keys
+    if the_foreign_keys is not None:
+        return the_foreign_keys
+    if get_schema.reduced_cache_dir is None:
+        the_foreign_keys = extract_foreign_keys()
+        return the_foreign_keys
+    key = foreign_keys_key()
+    try:
+        f = open(foreign_keys_cache_path(), 'rb')
+        try:
+            entry = cPickle.load(f)
+        finally:
+            f.close()
+        if entry.get('key') == key:
+            the_foreign_keys = entry['edges']
+            return the_foreign_keys
+    except (IOError, EOFError, cPickle.UnpicklingError):
+        pass
+    the_foreign_keys = extract_foreign_keys()
+    try:
+        if not os.path.isdir(get_schema.reduced_cache_dir):
+            os.makedirs(get_schema.reduced_cache_dir)
+        schema_store.write_atomically(foreign_keys_cache_path(),
+                                      cPickle.dumps({'key': key,
+                                                     'edges': the_foreign_keys},
+                                                    2))
+    except (IOError, OSError):
+        pass
+    return the_foreign_keys
+
+# The foreign keys as a graph: a map from each referenced table to the
+# edges which refer to it.
+
+def foreign_key_graph(edges=None):
+    if edges is None:
+        edges = get_foreign_keys()
+    graph = {}
+    for edge in edges:
+        graph.setdefault(edge[2], []).append(edge)
+    return graph
+
+def in_range(v, first, last):
+    registry = make_schema_doc.get_version_registry()
+    o = registry.ordinal(v)
+    return ((first is None or registry.ordinal(first) <= o)
+            and
+            (last is None or registry.ordinal(last) >= o))
+
+# The columns which lead some index of a table (including its primary
+# key), checked once for each distinct table, as in section 3.
+
+def leading_columns(t, checked):
+    key = id(t)
+    if not checked.has_key(key):
+        leading = {}
+        for index in t.indexes.values():
+            leading[index_fields(index)[0]] = 1
+        checked[key] = (t, leading)
+    return checked[key][1]
+
+# Return a list of (table, column, referenced table, referenced column,
+# first version, last version): each foreign key column which leads no
+# index, and the range of versions in which it does not.  column is
+# the name of the column in those versions.
+
+def find_unindexed_foreign_keys(first, last):
+    edges = get_foreign_keys()
+    checked = {}
+    def findings(v, schema, edges=edges, checked=checked):
+        found = []
+        for (table, column, rt, rc, f, l) in edges:
+            if not (in_range(v, f, l) and schema.has_key(table)):
+                continue
+            t = schema[table]
+            if not t.columns.has_key(column):
+                continue
+            name = t.columns[column].name
+            if not leading_columns(t, checked).has_key(name):
+                found.append((table, name, rt, rc))
+        return found
+    return sweep(first, last, findings)
+
+# 5. Reports.
+
+def default_range(first, last):
+    if first is None:
+        first = schema_remarks.version_order[0]
+    if last is None:
+        last = schema_remarks.version_order[-1]
+    return (first, last)
+
+redundant_descriptions = {
+    'duplicate': 'duplicates %s',
+    'prefix':    'is a prefix of %s',
+    'primary':   'is unique anyway, as it includes %s',
+    }
+
+def describe_redundant(finding):
+    (table, kind, name, others) = finding
+    return '%s:%s %s' % (table, name, redundant_descriptions[kind]
+                         % string.join(others, ', '))
+
+def report(first=None, last=None):
+    (first, last) = default_range(first, last)
+    found = find_redundant_indexes(first, last)
+    print_found(found, describe_redundant)
+    print '%d candidates from %s to %s' % (len(found), first, last)
+
+def describe_foreign_key(finding):
+    (table, column, rt, rc) = finding
+    return '%s.%s (foreign key %s.%s) has no index' % (table, column, rt, rc)
+
+def report_foreign_keys(first=None, last=None):
+    (first, last) = default_range(first, last)
+    found = find_unindexed_foreign_keys(first, last)
+    print_found(found, describe_foreign_key)
+    edges = get_foreign_keys()
+    print '%d unindexed, of %d foreign keys to %d tables, from %s to %s' % (
+        len(found), len(edges), len(foreign_key_graph(edges)), first, last)
+
+if __name__ == '__main__':
+    apply(report, sys.argv[1:3])
+    print
+    apply(report_foreign_keys, sys.argv[1:3])
+
+# A. REFERENCES
+#
+#
+# B. DOCUMENT HISTORY
+#
+# 2026-10-17 Created.
+#
+#
+# C. COPYRIGHT AND LICENSE
+#
+# This file is copyright (c) 2026 Perforce Software, Inc.  All rights
+# reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1.  Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+# 2.  Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# HOLDERS AND CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS
+# OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR
+# TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGE.
+#
+#
+# $Id$
@@ -15,14 +15,19 @@
 #
 # This document is not confidential.
 
+import bisect
+import cPickle
 import string
 import copy
+import os
 import re
+import sys
 import types
 import time
 
 import schema_remarks
 import get_schema
+import schema_store
 
 error = 'Schema processing error'
 
@@ -30,12 +35,12 @@ errors = []
 
 # 4. Handling multiple Bugzilla versions.
 #
-# version_compare is a comparison function for Bugzilla version names.
-# e.g. 2.17.1 > 2.16.5 > 2.16 > 2.16rc1 > 2.14.5.
+# version_key turns a Bugzilla version name into a list of items for
+# comparison, so that 2.17.1 > 2.16.5 > 2.16 > 2.16rc1 > 2.14.5.
 #
 # It works by breaking the version name into a list of items (major,
 # minor, optional separator, optional release), transforming each item
-# into an integer, and comparing the list of items.
+# into an integer.
 #
 # 2.17.1  -> 2,17,2,1
 # 2.16.5  -> 2,16,2,5
@@ -54,12 +59,83 @@ def version_item_transform(x):
     else:
         return int(x)
 
-def version_compare(v1,v2):
-    v1m = map(version_item_transform, version_re.match(v1).groups())
-    v2m = map(version_item_transform, version_re.match(v2).groups())
-    return cmp(v1m, v2m)
+def version_key(v):
+    m = version_re.match(v)
+    if m is None:
+        raise error, "Can't parse version name '%s'." % v
+    return map(version_item_transform, m.groups())
+
+# A version_registry gives each version name an integer ordinal, so
+# that comparing two versions is comparing two integers.  It is built
+# from a list of version names in order (schema_remarks.version_order):
+# the version at position i in the list has ordinal 2i+1.  Any other
+# version name (for instance, one used in a remark but not yet in the
+# list) is parsed once, when first seen, and given the even ordinal
+# between those of its neighbours in the list, or the odd ordinal of a
+# listed version with the same key.
+
+class version_registry:
+    def __init__(self, versions):
+        self.versions = list(versions)
+        self.keys = map(version_key, self.versions)
+        self.positions = {}
+        self.ordinals = {}
+        for i in range(len(self.versions)):
+            if i > 0 and self.keys[i - 1] > self.keys[i]:
+                raise error, ("Version '%s' comes before version '%s'."
+                              % (self.versions[i], self.versions[i - 1]))
+            self.positions[self.versions[i]] = i
+            self.ordinals[self.versions[i]] = 2 * i + 1
+
+    def known(self, v):
+        return self.positions.has_key(v)
+
+    # The position of a listed version in the list.
+    def position(self, v):
+        if not self.positions.has_key(v):
+            raise error, "I don't know about version '%s'." % v
+        return self.positions[v]
+
+    def ordinal(self, v):
+        if self.ordinals.has_key(v):
+            return self.ordinals[v]
+        key = version_key(v)
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            o = 2 * i + 1
+        else:
+            o = 2 * i
+        self.ordinals[v] = o
+        return o
+
+    # Two unlisted versions between the same neighbours have the same
+    # ordinal, so only they need comparing by key.
+    def compare(self, v1, v2):
+        (o1, o2) = (self.ordinal(v1), self.ordinal(v2))
+        if o1 == o2 and o1 % 2 == 0 and v1 != v2:
+            return cmp(version_key(v1), version_key(v2))
+        return cmp(o1, o2)
+
+    # The listed versions from first to last inclusive.
+    def range(self, first, last):
+        return self.versions[self.position(first) : self.position(last) + 1]
+
+the_version_registry = None
+
+def get_version_registry():
+    global the_version_registry
+    if the_version_registry is None:
+        the_version_registry = version_registry(schema_remarks.version_order)
+    return the_version_registry
 
-vd_cache = {}
+def reset_version_registry():
+    global the_version_registry
+    the_version_registry = None
+
+# version_compare is a comparison function for Bugzilla version names.
+
+def version_compare(v1,v2):
+    return get_version_registry().compare(v1, v2)
 
 # versioning_dict takes two bugzilla versions, first and last, and the
 # list of the bugzilla_versions for which we are generating the schema
@@ -79,26 +155,61 @@ vd_cache = {}
 # red     Up to and including <last>    no versions before first
 # red     In version <only>             first = last
 # red     From <first> to <last>        first < last
+#
+# It finds whether there are versions before, inside, and after the
+# range by bisecting the sorted ordinals of the versions (see
+# version_ordinals), so it takes time logarithmic in the number of
+# versions.  Results are kept in vd_cache, keyed by (first, last,
+# versions); set vd_cache.size to change the number kept, and call
+# vd_cache.stats() for its hits and misses.
+
+vd_cache = get_schema.lru_cache(4096)
+
+# The ordinals of a tuple of versions, sorted.
+
+ordinals_cache = get_schema.lru_cache(16)
+
+def version_ordinals(versions):
+    ordinals = ordinals_cache.get(versions)
+    if ordinals is None:
+        registry = get_version_registry()
+        ordinals = map(registry.ordinal, versions)
+        ordinals.sort()
+        ordinals_cache.put(versions, ordinals)
+    return ordinals
 
 def versioning_dict(first, last, versions):
-    if not vd_cache.has_key(versions):
-        vd_cache[versions] = {}
-    if vd_cache[versions].has_key((first,last)):
-        return vd_cache[versions][(first,last)]
+    key = (first, last, versions)
+    entry = vd_cache.get(key)
+    if entry is not None:
+        return entry[0]
+    dict = versioning_dict_uncached(first, last, versions)
+    vd_cache.put(key, (dict,))
+    return dict
+
+def versioning_dict_uncached(first, last, versions):
+    ordinals = version_ordinals(versions)
+    if not ordinals:
+        return None
+    registry = get_version_registry()
+    if first:
+        first_ordinal = registry.ordinal(first)
+    else:
+        first_ordinal = ordinals[0]
+    if last:
+        last_ordinal = registry.ordinal(last)
+    else:
+        last_ordinal = ordinals[-1]
     dict = {}
-    before_first = False # any versions before first?
-    inside = False       # any versions in the range?
-    after_last = False   # any versions after last?
-    for v in versions:
-        if first and version_compare(first, v) > 0:
-            before_first = True # this version is before the first
-        elif last and version_compare(last, v) < 0:
-            after_last = True # this version is after the last
-        elif not last or version_compare(last, v) >= 0:
-            inside = True # this version is inside the range
+    # any versions before first?
+    before_first = ordinals[0] < first_ordinal
+    # any versions after last?
+    after_last = ordinals[-1] > last_ordinal
+    # any versions in the range?
+    i = bisect.bisect_left(ordinals, first_ordinal)
+    inside = i < len(ordinals) and ordinals[i] <= last_ordinal
     if not inside:
-        vd_cache[versions][(first,last)] = None
-        return
+        return None
     outside = before_first or after_last
     if not outside:
         dict['VERSION_COLOUR'] = ''
@@ -115,7 +226,6 @@ def versioning_dict(first, last, versions):
     elif not before_first and after_last:
         dict['VERSION_COLOUR'] = red
         dict['VERSION_STRING'] = '<b>Up to and including %s:</b> ' % last
-    vd_cache[versions][(first,last)] = dict
     return dict
     
 # Parts of the schema description only apply to particular ranges of
@@ -188,11 +298,11 @@ def output_description(table, colour, remark, columns, colours, dict, bv):
     cs.sort()
     for c in cs:
         d = columns[c]
-        if d['Remarks']:
-            d['Remarks'] = string.join(map(lambda r,bv=bv,d=dict: process(r,bv,d),d['Remarks']),
-                                       ' ')
+        if d.remarks:
+            d.remarks = string.join(map(lambda r,bv=bv,d=dict: process(r,bv,d),d.remarks),
+                                    ' ')
         else:
-            d['Remarks'] = '-'
+            d.remarks = '-'
         output_row('column-%s-%s' % (table, c), c, d, ['Type',
                                                        'Default',
                                                        'Properties',
@@ -202,13 +312,13 @@ def output_description(table, colour, remark, columns, colours, dict, bv):
 
 # output the indexes table for a table    
 
-def output_indexes(table, colour, indexes, colours, dict, bv):
+def output_indexes(table, colour, indexes, colours, dict, bv, size=None):
     add('<table%s border="1" cellspacing="0" cellpadding="5">\n\n' % colour)
     # order the indexes: PRIMARY first, then alphabetical.
     inames = indexes.keys()
+    inames.sort()
     if 'PRIMARY' in inames:
         inames.remove('PRIMARY')
-        inames.sort()
         inames = ['PRIMARY'] + inames
     add('  <tr valign="top" align="left">\n\n')
     add('    <th>Name</th>\n\n')
@@ -218,17 +328,101 @@ def output_indexes(table, colour, indexes, colours, dict, bv):
     add('  </tr>\n\n')
     for iname in inames:
         l = indexes[iname]
-        if l['Remarks']:
-            l['Remarks'] = string.join(map(lambda r,bv=bv,d=dict: process(r,bv,d),l['Remarks']),
-                                       ' ')
+        if l.remarks:
+            l.remarks = string.join(map(lambda r,bv=bv,d=dict: process(r,bv,d),l.remarks),
+                                    ' ')
         else:
-            l['Remarks'] = '-'
+            l.remarks = '-'
+        if size is not None and size.indexes.get(iname) is not None:
+            l.remarks = (l.remarks + ' <em>Cardinality in production: %s.</em>'
+                         % format_count(size.indexes[iname]))
         output_row("index-%s-%s" % (table, iname), iname, l, ['Fields',
                                                               'Properties',
                                                               'Remarks'],
                    colours[iname])
     add ('</table>\n\n')
 
+# output the physical details of a table, as in the last version
+# described: its storage engine, row format and collation (if the
+# schema was captured with them), the indexes which only index a
+# prefix of a column, and its foreign keys.  Set show_physical to
+# include these.
+
+show_physical = 0
+
+def output_physical(table, bv):
+    storage = get_schema.get_physical(
+        schema_remarks.version_schema_map[bv[-1]]).get(table)
+    if storage is None:
+        return
+    details = []
+    for (name, value) in [('engine', storage.engine),
+                          ('row format', storage.row_format),
+                          ('collation', storage.collation)]:
+        if value:
+            details.append('%s %s' % (name, value))
+    inames = storage.index_parts.keys()
+    inames.sort()
+    for iname in inames:
+        prefixes = filter(lambda p: p[1] is not None,
+                          storage.index_parts[iname])
+        if prefixes:
+            details.append('index %s on a prefix of %s' % (
+                iname, string.join(map(lambda p: '%s (%d)' % (p[0], p[1]),
+                                       prefixes), ', ')))
+    knames = storage.foreign_keys.keys()
+    knames.sort()
+    for kname in knames:
+        k = storage.foreign_keys[kname]
+        details.append('foreign key %s (%s) references %s (%s)' % (
+            kname, string.join(k.columns, ', '), k.referenced_table,
+            string.join(k.referenced_columns, ', ')))
+    if details:
+        # the body is formatted with '%', later.
+        add('<p>Physical details in %s: %s.</p>\n\n'
+            % (bv[-1], string.join(details, '; ').replace('%', '%%')))
+
+# Production sizes.  Set show_sizes to annotate each table, and each
+# index, with its size in the database recorded by
+# pickle_schema.pickle_sizes, using the last version described whose
+# schema has sizes recorded.  The label gives the Bugzilla version the
+# sizes were captured from (or, for sizes recorded without it, that
+# last version).
+
+show_sizes = 0
+
+def find_sizes(bv):
+    for i in range(len(bv) - 1, -1, -1):
+        sv = schema_remarks.version_schema_map[bv[i]]
+        sizes = get_schema.get_sizes(sv)
+        if sizes is not None:
+            return (get_schema.get_sizes_version(sv) or bv[i], sizes)
+    return (None, None)
+
+def format_count(n):
+    return format(n, ',d')
+
+def format_bytes(n):
+    for unit in ['bytes', 'KB', 'MB', 'GB']:
+        if n < 1024 or unit == 'GB':
+            break
+        n = n / 1024.0
+    if unit == 'bytes':
+        return '%d bytes' % n
+    return '%.1f %s' % (n, unit)
+
+def output_size(size, version):
+    details = []
+    if size.rows is not None:
+        details.append('%s rows' % format_count(size.rows))
+    if size.data_length is not None:
+        details.append('data %s' % format_bytes(size.data_length))
+    if size.index_length is not None:
+        details.append('indexes %s' % format_bytes(size.index_length))
+    if details:
+        add('<p>Production size in %s: %s.</p>\n\n'
+            % (version, string.join(details, '; ')))
+
 def make_output_dict(schema, bugzilla_versions):
     dict={}
     dict['FIRST_VERSION'] = bugzilla_versions[0]
@@ -243,10 +437,9 @@ def make_output_dict(schema, bugzilla_versions):
     for table in tables:
         dict['the-table-%s' % table] = 'the <a href="#table-%s">%s</a> table' % (table, table)
         dict['table-%s' % table] = '<a href="#table-%s">%s</a>' % (table,table)
-        (versions, columns, indexes) = schema[table]
-        for c in columns.keys():
+        for c in schema[table].columns.keys():
             dict['column-%s-%s' % (table, c)] = '<a href="#column-%s-%s">%s.%s</a>' % (table, c, table, c)
-        for i in indexes.keys():
+        for i in schema[table].indexes.keys():
             dict['index-%s-%s' % (table, i)] = '<a href="#index-%s-%s">%s:%s</a>' % (table, i, table, i)
     for t in schema_remarks.table_remark.keys():
         k = 'the-table-%s' % t
@@ -327,8 +520,14 @@ def output_schema(schema, remarks, colours, bugzilla_versions):
     quick_tables_table_rows = []
     tables = schema.keys()
     tables.sort()
+    sizes = None
+    if show_sizes:
+        (sizes_version, sizes) = find_sizes(bugzilla_versions)
     for table in tables:
         (versions, columns, indexes) = schema[table]
+        size = None
+        if sizes is not None:
+            size = sizes.get(table)
         colour = colours[table]['']
         remark = string.join(map(lambda r,bv=bugzilla_versions,d=dict: process(r,bv,d),remarks[table]),
                              ' ')
@@ -338,12 +537,17 @@ def output_schema(schema, remarks, colours, bugzilla_versions):
         add('<h3><a id="table-%s" name="table-%s">The "%s" table</a></h3>\n\n\n' % (table, table, table))
         output_description(table, colour, remark, columns,
                            colours[table]['column'], dict, bugzilla_versions)
+        if size is not None:
+            output_size(size, sizes_version)
         if indexes:
             add('<p>Indexes:</p>\n\n')
             output_indexes(table, colour, indexes,
-                           colours[table]['index'], dict, bugzilla_versions)
+                           colours[table]['index'], dict, bugzilla_versions,
+                           size)
         else:
             add('<p>The "%s" table has no indexes.</p>' % table)
+        if show_physical:
+            output_physical(table, bugzilla_versions)
     tables_tables(tables_table_rows, quick_tables_table_rows, dict)
     return (dict, body)
 
@@ -391,30 +595,144 @@ def init_colours(colours, t, cols, inds):
 # So list[-1][1] is the current value.  When we're done figuring out
 # the schema history, we replace this list with a single value.
 
-# Make the initial pair lists for a column.
+# The schemas from get_schema are shared and read-only, so pairing up
+# makes new VersionedColumn and VersionedIndex records, which refer to
+# the same values.  These are like get_schema's Column and Index
+# records, but each field which can change holds a pair list, and
+# they also have:
+#
+# versions: the Bugzilla versions in which this column or index is
+#           present, as a version mask (see below);
+# reduced:  the reduced record the latest pair came from.
+#           get_schema shares identical reduced records, so if two
+#           versions have the same reduced record, nothing has changed.
+#
+# When the pair lists are stringified, they become single values
+# again.  Like get_schema's records, these can be used as mappings,
+# for '%' formatting and in output_row.
+
+class VersionedColumn(get_schema.mapping_view):
+    __slots__ = ('versions', 'name', 'default', 'type', 'properties',
+                 'remarks', 'reduced')
+    attributes = __slots__
+    keys_map = get_schema.Column.keys_map
+
+    def __setitem__(self, key, value):
+        setattr(self, self.keys_map[key], value)
+
+class VersionedIndex(get_schema.mapping_view):
+    __slots__ = ('versions', 'name', 'fields', 'properties',
+                 'remarks', 'reduced')
+    attributes = __slots__
+    keys_map = get_schema.Index.keys_map
+
+    def __setitem__(self, key, value):
+        setattr(self, self.keys_map[key], value)
+
+# The fields of columns and indexes which can change, as (key,
+# attribute) pairs.
 
-def pair_up_column_entries(bz, column):
-    for k in ['Name', 'Type', 'Default', 'Properties']:
-        column[k] = [(bz, column[k])]
+column_fields = [('Name', 'name'),
+                 ('Default', 'default'),
+                 ('Type', 'type'),
+                 ('Properties', 'properties')]
+
+index_fields = [('Name', 'name'),
+                ('Fields', 'fields'),
+                ('Properties', 'properties')]
+
+# A versioned table: the Bugzilla versions in which it is present, as
+# a version mask, and maps from name to VersionedColumn and
+# VersionedIndex.  It can also
+# be unpacked, or indexed, as (versions, columns, indexes).
+
+class VersionedTable(object):
+    __slots__ = ('versions', 'columns', 'indexes')
+
+    def __init__(self, versions, columns, indexes):
+        self.versions = versions
+        self.columns = columns
+        self.indexes = indexes
+
+    def __iter__(self):
+        return iter((self.versions, self.columns, self.indexes))
+
+    def __getitem__(self, i):
+        return (self.versions, self.columns, self.indexes)[i]
+
+# A set of the Bugzilla versions in a report is a version mask: an
+# integer in which bit k is set if the set includes the k'th version
+# in the report (counting from 0).  So the first version is bit 1 and
+# the last is bit 1 << (n - 1).
+
+# The positions of the bits set in a mask, in order.
+
+def mask_bits(mask):
+    bits = []
+    while mask:
+        bit = mask & -mask
+        bits.append(bit.bit_length() - 1)
+        mask = mask ^ bit
+    return bits
+
+# A mask of the versions at which something with version mask 'mask'
+# is added or removed, considering only the versions in mask 'within'
+# (in which its table is present), and not the first of those.  It is
+# added at a version in the result if that version is in 'mask', and
+# removed otherwise.
+#
+# Bit k is a transition if it differs from the bit before it.  Where
+# 'within' has gaps, the bits in each gap are first filled with the
+# bit before the gap, so that each version is compared with the
+# previous version in 'within'.
+
+def mask_transitions(mask, within):
+    low = within & -within
+    gaps = ((1 << within.bit_length()) - low) & ~within
+    while gaps:
+        fill = (mask << 1) & gaps & ~mask
+        if not fill:
+            break
+        mask = mask | fill
+    return (mask ^ (mask << 1)) & within & ~low
+
+# Make the initial pair lists for a column, present in version bz at
+# position 'bit' in the report.
+
+def pair_up_column_entries(bz, bit, column):
+    paired = VersionedColumn()
+    paired.versions = bit
+    paired.name = [(bz, column.name)]
+    paired.default = [(bz, column.default)]
+    paired.type = [(bz, column.type)]
+    paired.properties = [(bz, column.properties)]
+    paired.remarks = list(column.remarks)
+    paired.reduced = column
+    return paired
 
 # Make the initial pair lists for an index.
 
-def pair_up_index_entries(bz, index):
-    for k in ['Name', 'Fields', 'Properties']:
-        index[k] = [(bz, index[k])]
+def pair_up_index_entries(bz, bit, index):
+    paired = VersionedIndex()
+    paired.versions = bit
+    paired.name = [(bz, index.name)]
+    paired.fields = [(bz, index.fields)]
+    paired.properties = [(bz, index.properties)]
+    paired.remarks = list(index.remarks)
+    paired.reduced = index
+    return paired
 
 # Make all the initial pair lists for a table.
     
-def pair_up_table_entries(bz, schema, table):
+def pair_up_table_entries(bz, bit, schema, table):
     (columns, indexes) = schema[table]
-    for c in columns.values():
-        pair_up_column_entries(bz, c)
-    for i in indexes.values():
-        pair_up_index_entries(bz, i)
-
-def pair_up_schema(bz, schema):
-    for t in schema.keys():
-        pair_up_table_entries(bz, schema, t)
+    paired_columns = {}
+    for (c, column) in columns.items():
+        paired_columns[c] = pair_up_column_entries(bz, bit, column)
+    paired_indexes = {}
+    for (i, index) in indexes.items():
+        paired_indexes[i] = pair_up_index_entries(bz, bit, index)
+    return (paired_columns, paired_indexes)
 
 # Given a pair list, make a single value which explains the history.
 # I've tried various ways of showing this; this is the best I've come
@@ -484,15 +802,16 @@ def stringify_type(pl):
 # Given a schema, fix up all the pair lists.    
 
 def stringify_schema(schema):
-    for table in schema.keys():
-        (versions, columns, indexes) = schema[table]
-        for c in columns.values():
-            c['Type'] = stringify_type(c['Type'])
-            for k in ['Name', 'Default', 'Properties']:
-                c[k] = stringify_pairs(c[k])
-        for i in indexes.values():
-            for k in ['Name', 'Fields', 'Properties']:
-                i[k] = stringify_pairs(i[k])
+    for table in schema.values():
+        for c in table.columns.values():
+            c.type = stringify_type(c.type)
+            c.name = stringify_pairs(c.name)
+            c.default = stringify_pairs(c.default)
+            c.properties = stringify_pairs(c.properties)
+        for i in table.indexes.values():
+            i.name = stringify_pairs(i.name)
+            i.fields = stringify_pairs(i.fields)
+            i.properties = stringify_pairs(i.properties)
 
 def make_annotation(base, note):
     if note:
@@ -500,187 +819,221 @@ def make_annotation(base, note):
     else:
         return (' <b>%s.</b>\n' % base)
 
-# Given a list of schemas, produce a single versioned schema, fill in
-# the colour tables and add to all the remarks reflecting schema
-# versions in which particular tables/columns/indexes are added and/or
-# removed.
+# Given a list of (Bugzilla version, schema) pairs, produce a single
+# versioned schema, fill in the colour tables and add to all the
+# remarks reflecting schema versions in which particular
+# tables/columns/indexes are added and/or removed.
+#
+# We work one table at a time, asking each schema only for the tables
+# it has, so with lazy schemas from get_schema.get_schema, only the
+# tables in the report are ever read.
 
 def make_versioned_schema(schema_list,
                           colours,
                           table_remarks):
-    # Pivot so we get a map from table/column/index to paired lists of
-    # properties and lists of BZ versions.  Fill in blue cells while
-    # we're doing this.
+    # Find all the tables, and the BZ versions in which each appears.
     tables = {}
     bzs = []
+    schemas = {}
     for (bz, schema) in schema_list:
+        bit = 1 << len(bzs)
         bzs.append(bz)
+        schemas[bz] = schema
         for t in schema.keys():
             if not tables.has_key(t):
-                tables[t] = ([],{},{})
-                if schema_remarks.table_remark.has_key(t):
-                    remark = schema_remarks.table_remark[t]
-                    if remark is None:
-                        remark = []
-                    elif type(remark) == types.StringType:
-                        remark = [remark]
-                    else:
-                        remark = remark[:]
-                else:
-                    remark = []
-                table_remarks[t] = remark
-            tables[t][0].append(bz)
-            (cols,inds) = schema[t]
+                tables[t] = VersionedTable(0,{},{})
+                table_remarks[t] = initial_table_remark(t)
+            tables[t].versions = tables[t].versions | bit
+
+    # Pivot each table so we get a map from column/index to paired
+    # lists of properties and lists of BZ versions.  Fill in blue
+    # cells while we're doing this.
+    for (t, table) in tables.items():
+        for k in mask_bits(table.versions):
+            bz = bzs[k]
+            bit = 1 << k
+            (cols,inds) = pair_up_table_entries(bz, bit, schemas[bz], t)
             init_colours(colours, t, cols.keys(), inds.keys())
-            for c in cols.keys():
-                crec = tables[t][1].get(c,{'versions': []})
-                tables[t][1][c] = crec
-                crec['versions'].append(bz)
-                for k in ['Name', 'Default', 'Type', 'Properties']:
-                    if (crec.has_key(k) and
-                        crec[k][-1][1] != cols[c][k][0][1]):
-                        colours[t]['column'][c][k] = blue
-                    crec[k] = crec.get(k,[])
-                    crec[k] += cols[c][k]
-                    crec['Remarks'] = cols[c]['Remarks']
-            for i in inds.keys():
-                irec = tables[t][2].get(i,{'versions': []})
-                tables[t][2][i] = irec
-                irec['versions'].append(bz)
-                for k in ['Name', 'Fields', 'Properties']:
-                    if (irec.has_key(k) and
-                        irec[k][-1][1] != inds[i][k][0][1]):
-                        colours[t]['index'][i][k] = blue
-                    irec[k] = irec.get(k, [])
-                    irec[k] += inds[i][k]
-                    irec['Remarks'] = inds[i]['Remarks']
-
-    # Now we know all the tables, columns, indexes in our report,
-    # and what versions of bugzilla each one appears in.
-    # Figure out all the colours and remarks accordingly.
-    first_bz = schema_list[0][0]
-    last_bz = schema_list[-1][0]
-    for t in tables.keys():
-        v = tables[t][0]
-        if last_bz not in v:     # not in last version: red
+            # The first time we see a column or index, its paired
+            # record becomes the versioned record; later versions add
+            # to its pair lists.
+            for (c, col) in cols.items():
+                crec = table.columns.get(c)
+                if crec is None:
+                    table.columns[c] = col
+                    continue
+                crec.versions = crec.versions | bit
+                if crec.reduced is not col.reduced:
+                    for (k, a) in column_fields:
+                        if getattr(crec, a)[-1][1] != getattr(col, a)[0][1]:
+                            colours[t]['column'][c][k] = blue
+                    crec.reduced = col.reduced
+                for (k, a) in column_fields:
+                    getattr(crec, a).extend(getattr(col, a))
+                crec.remarks = col.remarks
+            for (i, ind) in inds.items():
+                irec = table.indexes.get(i)
+                if irec is None:
+                    table.indexes[i] = ind
+                    continue
+                irec.versions = irec.versions | bit
+                if irec.reduced is not ind.reduced:
+                    for (k, a) in index_fields:
+                        if getattr(irec, a)[-1][1] != getattr(ind, a)[0][1]:
+                            colours[t]['index'][i][k] = blue
+                    irec.reduced = ind.reduced
+                for (k, a) in index_fields:
+                    getattr(irec, a).extend(getattr(ind, a))
+                irec.remarks = ind.remarks
+
+    annotate_versioned_schema(tables, bzs, colours, table_remarks)
+    return tables
+
+# The remarks for a table, before any are added for the versions in
+# which it is added or removed.
+
+def initial_table_remark(t):
+    if schema_remarks.table_remark.has_key(t):
+        remark = schema_remarks.table_remark[t]
+        if remark is None:
+            remark = []
+        elif type(remark) == types.StringType:
+            remark = [remark]
+        else:
+            remark = remark[:]
+    else:
+        remark = []
+    return remark
+
+# Given a map from table name to VersionedTable, with version masks
+# over the Bugzilla versions bzs, we know all the tables, columns,
+# indexes in our report, and what versions of bugzilla each one
+# appears in.  Figure out all the colours and remarks accordingly.
+# Work in order of name, so that any errors come in that order.
+
+def annotate_versioned_schema(tables, bzs, colours, table_remarks):
+    first_bit = 1
+    last_bit = 1 << (len(bzs) - 1)
+    all_bits = (1 << len(bzs)) - 1
+    names = tables.keys()
+    names.sort()
+    for t in names:
+        table = tables[t]
+        v = table.versions
+        if not v & last_bit:     # not in last version: red
             colours[t][''] = red
-        elif first_bz not in v:  # not in first version: green
+        elif not v & first_bit:  # not in first version: green
             colours[t][''] = green
         # don't colour tables blue, so we're done
-        present = (first_bz in v)
-        for bz in bzs:
-            if present and (bz not in v): # removed in this version
-                present = False
-                if schema_remarks.table_removed_remark.has_key(t):
-                    note = schema_remarks.table_removed_remark[t]
-                    note = make_annotation('Removed in %s' % bz, note)
-                    table_remarks[t].append(note)
-                else:
-                    errors.append('No remark to remove table %s' % t)
-            elif (not present) and (bz in v): # added in this version
-                present = True
-                if schema_remarks.table_added_remark.has_key(t):
-                    note = schema_remarks.table_added_remark[t]
-                    note = make_annotation('Added in %s' % bz, note)
-                    table_remarks[t].append(note)
-                else:
-                    errors.append('No remark to add table %s' % t)
+        annotate_changes(table_remarks[t], 'table', t, None,
+                         mask_changes(v, all_bits, bzs))
 
         # now the columns:
-        for c in tables[t][1].keys():
-            v = tables[t][1][c]['versions']
-            if last_bz not in v:
+        for (c, crec) in sorted(table.columns.items()):
+            v = crec.versions
+            if not v & last_bit:
                 colours[t]['column'][c][''] = red
-            elif first_bz not in v:
+            elif not v & first_bit:
                 colours[t]['column'][c][''] = green
             # don't colour whole column rows blue, so we're done
-            present = tables[t][0][0] in v
-            for bz in tables[t][0]:
-                if present and (bz not in v):
-                    # removed in this version
-                    present = False
-                    if (schema_remarks.column_removed_remark.has_key(t) and
-                        schema_remarks.column_removed_remark[t].has_key(c)):
-                        note = schema_remarks.column_removed_remark[t][c]
-                    else:
-                        errors.append("No remark to remove %s.%s." %(t, c))
-                        note = None
-                    note = make_annotation('Removed in %s' % bz, note)
-                    tables[t][1][c]['Remarks'].append(note)
-                elif (not present) and (bz in v):
-                    # added in this version
-                    present = True
-                    if (schema_remarks.column_added_remark.has_key(t) and
-                        schema_remarks.column_added_remark[t].has_key(c)):
-                        note = schema_remarks.column_added_remark[t][c]
-                    else:
-                        errors.append("No remark to add %s.%s." % (t,c))
-                        note = None
-                    note = make_annotation('Added in %s' % bz, note)
-                    tables[t][1][c]['Remarks'].append(note)
+            annotate_changes(crec.remarks, 'column', t, c,
+                             mask_changes(v, table.versions, bzs))
 
         # now the indexes:
-        for i in tables[t][2].keys():
-            v = tables[t][2][i]['versions']
-            if last_bz not in v:
+        for (i, irec) in sorted(table.indexes.items()):
+            v = irec.versions
+            if not v & last_bit:
                 colours[t]['index'][i][''] = red
-            elif first_bz not in v:
+            elif not v & first_bit:
                 colours[t]['index'][i][''] = green
             # don't colour whole index rows blue, so we're done
-            present = tables[t][0][0] in v
-            for bz in tables[t][0]:
-                if present and (bz not in v):
-                    # removed in this version
-                    present = False
-                    if (schema_remarks.index_removed_remark.has_key(t) and
-                        schema_remarks.index_removed_remark[t].has_key(i)):
-                        note = schema_remarks.index_removed_remark[t][i]
-                    else:
-                        errors.append("No remark to remove %s:%s." %(t, i))
-                        note = None
-                    note = make_annotation('Removed in %s' % bz, note)
-                    tables[t][2][i]['Remarks'].append(note)
-                elif (not present) and (bz in v):
-                    # added in this version
-                    present = True
-                    if (schema_remarks.index_added_remark.has_key(t) and
-                        schema_remarks.index_added_remark[t].has_key(i)):
-                        note = schema_remarks.index_added_remark[t][i]
-                    else:
-                        errors.append("No remark to add %s:%s." % (t, i))
-                        note = None
-                    note = make_annotation('Added in %s' % bz, note)
-                    tables[t][2][i]['Remarks'].append(note)
-    return tables
+            annotate_changes(irec.remarks, 'index', t, i,
+                             mask_changes(v, table.versions, bzs))
 
-# get all the schemas and combine them.
+# The versions at which something with version mask v is added or
+# removed, considering only the versions in mask 'within' (see
+# mask_transitions), as a list of (Bugzilla version, added).
 
-def get_versioned_tables(first, last):
-    global errors
-    errors = []
-    if not first in schema_remarks.version_order:
-        raise error, "I don't know about version '%s'." % last
-    if not last in schema_remarks.version_order:
-        raise error, "I don't know about version '%s'." % last
-    if not (schema_remarks.version_order.index(last) >= schema_remarks.version_order.index(first)):
+def mask_changes(v, within, bzs):
+    return map(lambda k, v=v, bzs=bzs: (bzs[k], (v >> k) & 1),
+               mask_bits(mask_transitions(v, within)))
+
+# Add to remarks a note for each version in which a table, column or
+# index (kind 'table', 'column' or 'index'; name is None for a table)
+# is added or removed.  changes is a list of (Bugzilla version,
+# added).  The notes come from schema_remarks.table_added_remark,
+# column_removed_remark, and so on.
+
+annotation_separator = {'column': '.', 'index': ':'}
+
+def annotate_changes(remarks, kind, t, name, changes):
+    for (bz, added) in changes:
+        if added:
+            (what, base) = ('add', 'Added in %s' % bz)
+            notes = getattr(schema_remarks, '%s_added_remark' % kind)
+        else:
+            (what, base) = ('remove', 'Removed in %s' % bz)
+            notes = getattr(schema_remarks, '%s_removed_remark' % kind)
+        if kind == 'table':
+            if notes.has_key(t):
+                remarks.append(make_annotation(base, notes[t]))
+            else:
+                errors.append('No remark to %s table %s' % (what, t))
+            continue
+        if notes.has_key(t) and notes[t].has_key(name):
+            note = notes[t][name]
+        else:
+            errors.append("No remark to %s %s%s%s." %
+                          (what, t, annotation_separator[kind], name))
+            note = None
+        remarks.append(make_annotation(base, note))
+
+# get all the schemas and combine them.  If tables is given, the
+# result has only those tables, and only those tables are read.
+# Otherwise, if parallel_processes is more than 1, schemas are loaded
+# and reduced by that many worker processes (see
+# get_schema.get_schemas).  If use_history is set, the result is
+# projected from the history of every version instead (see section 7).
+
+parallel_processes = 0
+
+# Return the Bugzilla versions from first to last, and a list of
+# (Bugzilla version, schema name) for the versions at which the schema
+# changes.
+
+def schema_changes(first, last):
+    registry = get_version_registry()
+    if not (registry.position(last) >= registry.position(first)):
         raise error, "Version '%s' comes before version '%s'." % (last, first)
-    colours = {}
-    tr = {}
-    schema_name = schema_remarks.version_schema_map[first]
-    schema, errors = get_schema.get_schema(schema_name, errors)
-    # turn fields into lists connecting Bugzilla version to value
-    pair_up_schema(first, schema)
-    schemas = [(first, schema)]
-    bugzilla_versions = schema_remarks.version_order[(schema_remarks.version_order.index(first)) : (schema_remarks.version_order.index(last)+1)]
-    for bz_name in bugzilla_versions[1:]:
+    bugzilla_versions = registry.range(first, last)
+    changes = []
+    schema_name = None
+    for bz_name in bugzilla_versions:
         new_schema_name = schema_remarks.version_schema_map[bz_name]
         if new_schema_name == schema_name:
             continue
         schema_name = new_schema_name
-        new_schema, errors = get_schema.get_schema(schema_name, errors)
-        pair_up_schema(bz_name, new_schema)
-        schemas.append((bz_name, new_schema))
-    schema = make_versioned_schema(schemas,
+        changes.append((bz_name, schema_name))
+    return (bugzilla_versions, changes)
+
+def get_versioned_tables(first, last, tables=None):
+    global errors
+    errors = []
+    if use_history:
+        history = get_history(tables is None)
+        if history is not None and not history.errors:
+            return project_history(history, first, last, tables)
+    colours = {}
+    tr = {}
+    (bugzilla_versions, changes) = schema_changes(first, last)
+    if tables is None:
+        loaded = get_schema.get_schemas(map(lambda c: c[1], changes), errors,
+                                        parallel_processes)
+    else:
+        loaded = []
+        for (bz_name, schema_name) in changes:
+            loaded.append(get_schema.get_schema(schema_name, errors, tables)[0])
+    schema = make_versioned_schema(zip(map(lambda c: c[0], changes), loaded),
                                    colours,
                                    tr)
     stringify_schema(schema)
@@ -708,11 +1061,13 @@ def strip_p4_id(id):
 # afterword, to a named file.  This is the function we call to
 # generate our Bugzilla schema doc.  Note that although it will
 # generate schema diffs for various version ranges, the prelude and
-# afterword it adds are specific to certain Bugzilla versions.
+# afterword it adds are specific to certain Bugzilla versions.  If
+# tables is given, the document describes only those tables.
 
-def make_tables(first, last):
+def make_tables(first, last, tables=None):
     global errors
-    (schema, tr, colours, bv, errors) = get_versioned_tables(first, last)
+    (schema, tr, colours, bv, errors) = get_versioned_tables(first, last,
+                                                             tables)
     (dict, html) = output_schema(schema, tr, colours, bv)
     dict['VERSIONS_TABLE'] = make_version_table(bv)
     dict['TIME'] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time()))
@@ -729,18 +1084,488 @@ def make_tables(first, last):
         raise error, e
     return (header, body, footer)
 
-def write_file(first, last, filename):
+def write_file(first, last, filename, tables=None):
     file = open(filename, 'w')
-    (header, body, footer) = make_tables(first, last)
+    (header, body, footer) = make_tables(first, last, tables)
     file.write(header)
     file.write(body)
     file.write(footer)
     file.close()
 
-def make_body(first, last):
-    (header, body, footer) = make_tables(first, last)
+def make_body(first, last, tables=None):
+    (header, body, footer) = make_tables(first, last, tables)
     return body
 
+# 7. The history of every version.
+#
+# The history of the schema over all of schema_remarks.version_order
+# only changes when the pickles, schema_remarks.py, or this code
+# change.  So we build it once, keep it in the_history and in a file
+# in get_schema.reduced_cache_dir, and answer each request for a range
+# of versions with range queries over it (see project_history),
+# without loading any schemas.
+#
+# The history is a log of schema change events, in order (see section
+# 8).  It is stored as a map with these entries:
+#
+#   'key':      (remarks hash, hash of this module, schema hashes), as
+#               for get_schema's cache of reduced schemas;
+#   'versions': the Bugzilla versions at which the schema changes, as
+#               from schema_changes over all versions; we call the g'th
+#               of these "change g";
+#   'change':   a map from each Bugzilla version to the change in
+#               effect in that version;
+#   'events':   the list of Events;
+#   'errors':   the errors from reading the schemas.
+#
+# and read into an event_log, which indexes the events.
+#
+# A history with errors is not used, so that errors are reported for
+# each range just as before.  If there is no history yet, a request
+# for some tables only is built from those tables of the schemas (see
+# get_versioned_tables), rather than building the whole history.  Set
+# use_history to 0 to build every request from the schemas.
+
+use_history = 1
+
+# The fields of columns and indexes in the history: those which can
+# change, and their remarks.
+
+column_history_fields = column_fields + [('Remarks', 'remarks')]
+index_history_fields = index_fields + [('Remarks', 'remarks')]
+
+# To make the events, we first pivot the schemas, as
+# make_versioned_schema does, into a map from table name to [mask,
+# columns, indexes].  mask is a version mask over the changes (see
+# section 6), and columns and indexes map names to [mask, fields], in
+# which fields maps each attribute to a change list: a list of (g,
+# value), for the first change at which the column or index is present
+# and then for each change at which the value differs from that at the
+# previous change at which it is present.
+
+def add_history(records, key, g, reduced, fields):
+    if not records.has_key(key):
+        history = {}
+        for (k, a) in fields:
+            history[a] = [(g, getattr(reduced, a))]
+        records[key] = [1 << g, history]
+        return
+    record = records[key]
+    record[0] = record[0] | (1 << g)
+    for (k, a) in fields:
+        changes = record[1][a]
+        value = getattr(reduced, a)
+        if changes[-1][1] != value:
+            changes.append((g, value))
+
+def pivot_history(loaded):
+    tables = {}
+    for g in range(len(loaded)):
+        schema = loaded[g]
+        for t in schema.keys():
+            (columns, indexes) = schema[t]
+            if not tables.has_key(t):
+                tables[t] = [0, {}, {}]
+            record = tables[t]
+            record[0] = record[0] | (1 << g)
+            for (c, column) in columns.items():
+                add_history(record[1], c, g, column, column_history_fields)
+            for (i, index) in indexes.items():
+                add_history(record[2], i, g, index, index_history_fields)
+    return tables
+
+# The value in effect at change g, from a change list.
+
+def change_value(changes, g):
+    return changes[bisect.bisect_left(changes, (g + 1,)) - 1][1]
+
+# The changes at which something with version mask v is added or
+# removed, within mask 'within', as a list of (g, added).  Unlike
+# mask_changes, this includes the first change in 'within', if v is
+# present then.
+
+def presence_changes(v, within):
+    bits = mask_transitions(v, within) | (v & within & -within)
+    return map(lambda g, v=v: (g, (v >> g) & 1), mask_bits(bits))
+
+def history_events(versions, tables):
+    registry = get_version_registry()
+    events = []
+    def event(g, entity, t, name, kind, field=None, old=None, new=None,
+              versions=versions, registry=registry, events=events):
+        events.append(Event(registry.ordinal(versions[g]), versions[g], g,
+                            entity, t, name, kind, field, old, new))
+    all_bits = (1 << len(versions)) - 1
+    for (t, (mask, columns, indexes)) in tables.items():
+        for (g, added) in presence_changes(mask, all_bits):
+            event(g, 'table', t, None, ('removed', 'added')[added])
+        for (entity, records, fields) in (
+            ('column', columns, column_history_fields),
+            ('index', indexes, index_history_fields)):
+            for (name, (m, history)) in records.items():
+                for (g, added) in presence_changes(m, mask):
+                    if added:
+                        values = []
+                        for (k, a) in fields:
+                            values.append((k, change_value(history[a], g)))
+                        event(g, entity, t, name, 'added', new=tuple(values))
+                    else:
+                        event(g, entity, t, name, 'removed')
+                for (k, a) in fields:
+                    changes = history[a]
+                    for j in range(1, len(changes)):
+                        event(changes[j][0], entity, t, name, 'changed', k,
+                              changes[j - 1][1], changes[j][1])
+    events.sort(lambda a, b: cmp(event_order(a), event_order(b)))
+    return events
+
+def all_schema_changes():
+    versions = schema_remarks.version_order
+    return schema_changes(versions[0], versions[-1])
+
+def history_key(schema_names):
+    return (get_schema.remarks_hash(),
+            schema_store.source_hash(sys.modules[__name__]),
+            tuple(map(schema_store.schema_hash, schema_names)))
+
+def build_history():
+    (bugzilla_versions, changes) = all_schema_changes()
+    names = map(lambda c: c[1], changes)
+    versions = map(lambda c: c[0], changes)
+    errors = []
+    loaded = get_schema.get_schemas(names, errors, parallel_processes)
+    change = {}
+    g = -1
+    for bz in bugzilla_versions:
+        if g + 1 < len(changes) and changes[g + 1][0] == bz:
+            g = g + 1
+        change[bz] = g
+    return {'key': history_key(names),
+            'versions': versions,
+            'change': change,
+            'events': history_events(versions, pivot_history(loaded)),
+            'errors': errors}
+
+def history_path():
+    return os.path.join(get_schema.reduced_cache_dir, 'history')
+
+# Return the stored history, or None.
+
+def read_history(key):
+    if get_schema.reduced_cache_dir is None:
+        return None
+    try:
+        f = open(history_path(), 'rb')
+        try:
+            history = cPickle.load(f)
+        finally:
+            f.close()
+    except (IOError, EOFError, cPickle.UnpicklingError):
+        return None
+    if history.get('key') != key:
+        return None
+    return history
+
+def write_history(history):
+    if get_schema.reduced_cache_dir is None:
+        return
+    try:
+        if not os.path.isdir(get_schema.reduced_cache_dir):
+            os.makedirs(get_schema.reduced_cache_dir)
+        schema_store.write_atomically(history_path(),
+                                      cPickle.dumps(history, 2))
+    except (IOError, OSError):
+        pass
+
+the_history = None
+
+# Return the history as an event_log, reading it or building it if
+# need be; if build is 0, return None rather than building it.
+
+def get_history(build=1):
+    global the_history
+    if the_history is not None:
+        return the_history
+    names = map(lambda c: c[1], all_schema_changes()[1])
+    history = read_history(history_key(names))
+    if history is None:
+        if not build:
+            return None
+        history = build_history()
+        write_history(history)
+    the_history = event_log(history)
+    for table in the_history.tables.keys():
+        get_schema.ensure_table_remarks(table)
+    return the_history
+
+def reset_history():
+    global the_history
+    the_history = None
+
+# The pair list (see section 6) of a change list over a range of
+# versions, given the first and last changes in the range at which
+# the column or index is present: the value in effect at the first,
+# and then each change up to the last.  g0 is the change in effect at
+# the start of the range, and bzs the Bugzilla versions at which the
+# range's changes start.
+
+def project_pairs(changes, first, last, g0, bzs):
+    i = bisect.bisect_left(changes, (first + 1,)) - 1
+    j = bisect.bisect_left(changes, (last + 1,))
+    pl = [(bzs[first - g0], changes[i][1])]
+    for (g, value) in changes[i + 1 : j]:
+        pl.append((bzs[g - g0], value))
+    return pl
+
+# Project the columns or indexes (entity 'column' or 'index') of table
+# t onto the n changes of a range starting at change g0, in which the
+# table has version mask tv.  Returns a map from name to versioned
+# record (made by make), and a list of (name, key) for the fields
+# which change in the range, which are to be coloured blue.  The
+# records have no reduced record.
+
+def project_records(log, entity, t, tv, g0, n, bzs, make, fields):
+    projected = {}
+    changed = []
+    for name in log.tables[t][entity]:
+        key = (entity, t, name)
+        versions = log.presence_mask(key, g0, n) & tv
+        if not versions:
+            continue
+        record = make()
+        record.versions = versions
+        first = g0 + (versions & -versions).bit_length() - 1
+        last = g0 + versions.bit_length() - 1
+        for (k, a) in fields:
+            pl = project_pairs(log.fields[(key, k)], first, last, g0, bzs)
+            if len(pl) > 1:
+                changed.append((name, k))
+            setattr(record, a, pl)
+        record.remarks = list(change_value(log.fields[(key, 'Remarks')],
+                                           last))
+        record.reduced = None
+        projected[name] = record
+    return (projected, changed)
+
+# The changes in the range at which a table, column or index is added
+# or removed, after change 'since', as a list of (Bugzilla version,
+# added).  For a table, since is the first change in the range.  A
+# column or index is compared only with the versions in which its
+# table is present, so for those it is the table's first change in
+# the range.
+
+def range_changes(log, key, g0, n, bzs, since):
+    return map(lambda (g, added), g0=g0, bzs=bzs: (bzs[g - g0], added),
+               log.presence_between(key, since, g0 + n - 1))
+
+# Answer get_versioned_tables from the history.
+
+def project_history(log, first, last, tables=None):
+    colours = {}
+    tr = {}
+    (bugzilla_versions, changes) = schema_changes(first, last)
+    bzs = map(lambda c: c[0], changes)
+    g0 = log.change[first]
+    n = len(bzs)
+    first_bit = 1
+    last_bit = 1 << (n - 1)
+    if tables is None:
+        names = log.tables.keys()
+    else:
+        names = filter(log.tables.has_key, tables)
+    names.sort()
+    schema = {}
+    for t in names:
+        tv = log.presence_mask(('table', t, None), g0, n)
+        if not tv:
+            continue
+        (cols, blue_cols) = project_records(log, 'column', t, tv, g0, n, bzs,
+                                            VersionedColumn, column_fields)
+        (inds, blue_inds) = project_records(log, 'index', t, tv, g0, n, bzs,
+                                            VersionedIndex, index_fields)
+        init_colours(colours, t, cols.keys(), inds.keys())
+        for (c, k) in blue_cols:
+            colours[t]['column'][c][k] = blue
+        for (i, k) in blue_inds:
+            colours[t]['index'][i][k] = blue
+        tr[t] = initial_table_remark(t)
+        schema[t] = VersionedTable(tv, cols, inds)
+        if not tv & last_bit:
+            colours[t][''] = red
+        elif not tv & first_bit:
+            colours[t][''] = green
+        annotate_changes(tr[t], 'table', t, None,
+                         range_changes(log, ('table', t, None), g0, n, bzs,
+                                       g0))
+        since = g0 + (tv & -tv).bit_length() - 1
+        for (entity, records) in (('column', cols), ('index', inds)):
+            for (name, record) in sorted(records.items()):
+                v = record.versions
+                if not v & last_bit:
+                    colours[t][entity][name][''] = red
+                elif not v & first_bit:
+                    colours[t][entity][name][''] = green
+                annotate_changes(record.remarks, entity, t, name,
+                                 range_changes(log, (entity, t, name),
+                                               g0, n, bzs, since))
+    stringify_schema(schema)
+    return (schema, tr, colours, tuple(bugzilla_versions), errors)
+
+# 8. Schema change events.
+#
+# An Event is one change to the schema, at one change g (see section
+# 7):
+#
+#   ordinal: the ordinal of the Bugzilla version (see version_registry);
+#   version: the Bugzilla version at which change g starts;
+#   change:  g;
+#   entity:  'table', 'column' or 'index';
+#   table:   the table's name;
+#   name:    the column's or index's canonical name, or None for a table;
+#   kind:    'added', 'removed', or 'changed';
+#   field:   for a change, the field which changed ('Name', 'Default',
+#            'Type', 'Properties', 'Fields', or 'Remarks');
+#   old:     for a change, the old value;
+#   new:     for a change, the new value; for a column or index added,
+#            a tuple of (field, value) for all its fields.
+#
+# Columns and indexes are compared only with the previous change in
+# which their table is present, so when a table is removed, nothing
+# happens to its columns and indexes.  When a table is first present,
+# all its columns and indexes are added.
+
+class Event(get_schema.record):
+    __slots__ = ('ordinal', 'version', 'change', 'entity', 'table',
+                 'name', 'kind', 'field', 'old', 'new')
+    attributes = __slots__
+    keys_map = {'Ordinal': 'ordinal',
+                'Version': 'version',
+                'Change': 'change',
+                'Entity': 'entity',
+                'Table': 'table',
+                'Name': 'name',
+                'Kind': 'kind',
+                'Field': 'field',
+                'Old': 'old',
+                'New': 'new'}
+
+    def __init__(self, ordinal, version, change, entity, table, name,
+                 kind, field, old, new):
+        init = object.__setattr__
+        init(self, 'ordinal', ordinal)
+        init(self, 'version', version)
+        init(self, 'change', change)
+        init(self, 'entity', entity)
+        init(self, 'table', table)
+        init(self, 'name', name)
+        init(self, 'kind', kind)
+        init(self, 'field', field)
+        init(self, 'old', old)
+        init(self, 'new', new)
+
+# Events are ordered by change, then by table, with each table before
+# its columns and its columns before its indexes.
+
+entity_order = {'table': 0, 'column': 1, 'index': 2}
+kind_order = {'removed': 0, 'added': 1, 'changed': 2}
+
+def event_order(e):
+    return (e.change, e.table, entity_order[e.entity], e.name,
+            kind_order[e.kind], e.field)
+
+# An event_log holds the history (see section 7) and indexes its
+# events:
+#
+#   changes:  the change of each event, for bisecting;
+#   entities: a map from entity key (entity, table, name) to the list
+#             of its events;
+#   tables:   a map from table name to a map from 'column' and 'index'
+#             to the names of its columns and indexes;
+#   presence: a map from entity key to a list of (g, added) for the
+#             changes at which it is added or removed;
+#   fields:   a map from (entity key, field) to a change list, as in
+#             section 7.
+
+class event_log:
+    def __init__(self, history):
+        self.key = history['key']
+        self.versions = history['versions']
+        self.change = history['change']
+        self.events = history['events']
+        self.errors = history['errors']
+        self.changes = []
+        self.entities = {}
+        self.tables = {}
+        self.presence = {}
+        self.fields = {}
+        for e in self.events:
+            self.changes.append(e.change)
+            key = (e.entity, e.table, e.name)
+            if not self.entities.has_key(key):
+                self.entities[key] = []
+                if e.entity == 'table':
+                    self.tables[e.table] = {'column': [], 'index': []}
+                else:
+                    self.tables[e.table][e.entity].append(e.name)
+            self.entities[key].append(e)
+            if e.kind == 'changed':
+                self.add_field(key, e.field, e.change, e.new)
+                continue
+            self.presence.setdefault(key, []).append(
+                (e.change, e.kind == 'added'))
+            if e.kind == 'added' and e.new is not None:
+                for (field, value) in e.new:
+                    self.add_field(key, field, e.change, value)
+
+    def add_field(self, key, field, g, value):
+        changes = self.fields.setdefault((key, field), [])
+        if not changes or changes[-1][1] != value:
+            changes.append((g, value))
+
+    # The events after Bugzilla version first, up to and including
+    # last: "what changed between first and last?".
+
+    def between(self, first, last):
+        i = bisect.bisect_right(self.changes, self.change[first])
+        j = bisect.bisect_right(self.changes, self.change[last])
+        return self.events[i:j]
+
+    # The events for a table, or for one of its columns or indexes.
+
+    def entity_events(self, table, entity='table', name=None):
+        return self.entities.get((entity, table, name), [])
+
+    # The (g, added) for an entity after change g0, up to change g1.
+
+    def presence_between(self, key, g0, g1):
+        presence = self.presence[key]
+        i = bisect.bisect_left(presence, (g0 + 1,))
+        j = bisect.bisect_left(presence, (g1 + 1,))
+        return presence[i:j]
+
+    # A version mask for an entity over the n changes starting at g0.
+    # For a column or index, this takes no account of its table.
+
+    def presence_mask(self, key, g0, n):
+        presence = self.presence[key]
+        i = bisect.bisect_left(presence, (g0 + 1,))
+        present = i > 0 and presence[i - 1][1]
+        mask = 0
+        start = 0
+        for (g, added) in presence[i : bisect.bisect_left(presence, (g0 + n,))]:
+            if present:
+                mask = mask | (((1 << (g - g0)) - 1) & ~((1 << start) - 1))
+            (present, start) = (added, g - g0)
+        if present:
+            mask = mask | (((1 << n) - 1) & ~((1 << start) - 1))
+        return mask
+
+# Return the events after Bugzilla version first, up to and including
+# last, in order.
+
+def schema_events(first, last):
+    return get_history().between(first, last)
+
 # A. REFERENCES
 #
 #
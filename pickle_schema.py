@@ -16,7 +16,14 @@
 # This document is not confidential.
 
 import MySQLdb
-import cPickle
+import get_schema
+import Queue
+import schema_remarks
+import schema_store
+import threading
+import time
+
+error = 'pickling a schema'
 
 def fetchall(cursor):
     rows = cursor.fetchall()
@@ -25,8 +32,8 @@ def fetchall(cursor):
         rows = []
     return rows
 
-def select_rows(cursor, select):
-    rows = cursor.execute(select)
+def select_rows(cursor, select, args=None):
+    rows = cursor.execute(select, args)
     if cursor.description == None :
         raise error, ("Trying to fetch rows from non-select '%s'"
                       % select)
@@ -56,9 +63,11 @@ def fetch_rows_as_list_of_dictionaries(cursor, select):
         results.append(result)
     return results
 
-def pickle_schema(schema_version, db_name):
-    db = MySQLdb.connect(db=db_name, user='bugs')
-    cursor = db.cursor()
+# Capture a schema with 'show tables', and then 'describe' and 'show
+# index' for each table.  Returns a map from table name to (columns,
+# indexes), where columns and indexes are lists of row dictionaries.
+
+def describe_schema(cursor, db_name):
     tables = map(lambda x:x[0],select_rows(cursor, 'show tables'))
     schema = {}
     for table in tables:
@@ -67,17 +76,426 @@ def pickle_schema(schema_version, db_name):
         indexes = fetch_rows_as_list_of_dictionaries(cursor,
                                                      'show index from %s' % table)
         schema[table] = (columns, indexes)
-    db.close()
-    f = open('pickles/%s' % schema_version, 'w')
-    cPickle.dump((schema_version, schema), f)
-    f.close()
-    
+    return schema
+
+# Capture the same schema with two queries on information_schema (so
+# MySQL 5.0 or later), whatever the number of tables.  The rows are
+# built to be identical to the ones from 'describe' and 'show index':
+# the same keys, inserted in the same order, with the same values and
+# types.  The columns of a table come in the same order, as COLUMNS
+# has their positions.  STATISTICS has nothing to order the indexes
+# of a table as 'show index' does, so they come in whatever order the
+# server gives; the pickle is the same byte for byte only when that is
+# the order of 'show index' (as the servers we have tried give it).
+# Otherwise the indexes are the same, but their rows are in another
+# order, which changes the pickle but not the reduced schema.
+#
+# These map the columns of 'describe' and 'show index', in the order
+# they come, to the columns of information_schema.COLUMNS and
+# information_schema.STATISTICS.  'show index' has some columns only
+# in later versions of MySQL; we include those only if STATISTICS has
+# them too.
+
+describe_columns = [
+    ('Field',         'COLUMN_NAME'),
+    ('Type',          'COLUMN_TYPE'),
+    ('Null',          'IS_NULLABLE'),
+    ('Key',           'COLUMN_KEY'),
+    ('Default',       'COLUMN_DEFAULT'),
+    ('Extra',         'EXTRA'),
+    ]
+
+show_index_columns = [
+    ('Table',         'TABLE_NAME'),
+    ('Non_unique',    'NON_UNIQUE'),
+    ('Key_name',      'INDEX_NAME'),
+    ('Seq_in_index',  'SEQ_IN_INDEX'),
+    ('Column_name',   'COLUMN_NAME'),
+    ('Collation',     'COLLATION'),
+    ('Cardinality',   'CARDINALITY'),
+    ('Sub_part',      'SUB_PART'),
+    ('Packed',        'PACKED'),
+    ('Null',          'NULLABLE'),
+    ('Index_type',    'INDEX_TYPE'),
+    ('Comment',       'COMMENT'),
+    ('Index_comment', 'INDEX_COMMENT'),
+    ('Visible',       'IS_VISIBLE'),
+    ('Expression',    'EXPRESSION'),
+    ]
+
+# 'show index' gives these as longs (or None), whatever the type of
+# the information_schema column.
+
+show_index_longs = ['Non_unique', 'Seq_in_index', 'Cardinality', 'Sub_part']
+
+# Group rows (tuples, as fetched) by table name, making each into a
+# dictionary.  columns is a list of (key, information_schema column)
+# pairs; those whose column is not in the result are left out.
+# Returns a list of table names, in the order they first come, and a
+# map from table name to a list of row dictionaries.  The rows of the
+# tables may come mixed together.
+#
+# A pickle refers back to an object it has already written, so
+# whether two rows share their key strings shows in the pickle.  Rows
+# from 'describe' or 'show index' share the key strings of that one
+# query, so we give the rows of each table their own copies of the
+# keys, kept in a map from table name.
+
+def copy_string(s):
+    return s[:1] + s[1:]
+
+def group_rows(cursor, rows, columns, longs=[]):
+    names = column_names(cursor)
+    positions = []
+    for (key, column) in columns:
+        if column in names:
+            positions.append((key, names.index(column)))
+    table_position = names.index('TABLE_NAME')
+    tables = []
+    grouped = {}
+    table_keys = {}
+    for row in rows:
+        table = row[table_position]
+        if not grouped.has_key(table):
+            tables.append(table)
+            grouped[table] = []
+            table_keys[table] = map(lambda (key, i): (copy_string(key), i),
+                                    positions)
+        result = {}
+        for (key, i) in table_keys[table]:
+            value = row[i]
+            if key in longs and value is not None:
+                value = long(value)
+            result[key] = value
+        grouped[table].append(result)
+    return (tables, grouped)
+
+# If physical is a map, bulk_schema also puts the schema's physical
+# metadata in it (see schema_store.py, section 7): the collations come
+# from the same query as the columns, and two more queries get the
+# tables and the foreign keys.  Foreign key rules need MySQL 5.1 or
+# later.
+
+physical_table_columns = [
+    ('Engine',            'ENGINE'),
+    ('Row_format',        'ROW_FORMAT'),
+    ('Collation',         'TABLE_COLLATION'),
+    ]
+
+physical_column_columns = [
+    ('Field',             'COLUMN_NAME'),
+    ('Collation',         'COLLATION_NAME'),
+    ]
+
+foreign_key_columns = [
+    ('Constraint_name',   'CONSTRAINT_NAME'),
+    ('Column_name',       'COLUMN_NAME'),
+    ('Ordinal_position',  'ORDINAL_POSITION'),
+    ('Referenced_table',  'REFERENCED_TABLE_NAME'),
+    ('Referenced_column', 'REFERENCED_COLUMN_NAME'),
+    ('On_update',         'UPDATE_RULE'),
+    ('On_delete',         'DELETE_RULE'),
+    ]
+
+def bulk_physical(cursor, db_name, column_rows, physical):
+    (tables, collations) = group_rows(cursor, column_rows,
+                                      physical_column_columns)
+    rows = select_rows(cursor,
+                       'select * from information_schema.TABLES '
+                       'where TABLE_SCHEMA = %s', (db_name,))
+    table_rows = group_rows(cursor, rows, physical_table_columns)[1]
+    rows = select_rows(cursor,
+                       'select k.TABLE_NAME, k.CONSTRAINT_NAME, '
+                       'k.COLUMN_NAME, k.ORDINAL_POSITION, '
+                       'k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME, '
+                       'r.UPDATE_RULE, r.DELETE_RULE '
+                       'from information_schema.KEY_COLUMN_USAGE k '
+                       'join information_schema.REFERENTIAL_CONSTRAINTS r '
+                       'on r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA '
+                       'and r.TABLE_NAME = k.TABLE_NAME '
+                       'and r.CONSTRAINT_NAME = k.CONSTRAINT_NAME '
+                       'where k.TABLE_SCHEMA = %s '
+                       'order by k.TABLE_NAME, k.CONSTRAINT_NAME, '
+                       'k.ORDINAL_POSITION', (db_name,))
+    foreign_keys = group_rows(cursor, rows, foreign_key_columns,
+                              ['Ordinal_position'])[1]
+    for table in tables:
+        if table_rows.has_key(table):
+            entry = table_rows[table][0]
+        else:
+            entry = {'Engine': None, 'Row_format': None, 'Collation': None}
+        entry['Columns'] = {}
+        for c in collations[table]:
+            if c['Collation'] is not None:
+                entry['Columns'][c['Field']] = c['Collation']
+        entry['Foreign_keys'] = foreign_keys.get(table, [])
+        physical[table] = entry
+
+def bulk_schema(cursor, db_name, physical=None):
+    rows = select_rows(cursor,
+                       'select * from information_schema.COLUMNS '
+                       'where TABLE_SCHEMA = %s '
+                       'order by TABLE_NAME, ORDINAL_POSITION', (db_name,))
+    (tables, columns) = group_rows(cursor, rows, describe_columns)
+    if physical is not None:
+        bulk_physical(cursor, db_name, rows, physical)
+    # Not ordered, so that each table's rows come in the order the
+    # server keeps them, which is that of 'show index' (see above).
+    rows = select_rows(cursor,
+                       'select * from information_schema.STATISTICS '
+                       'where TABLE_SCHEMA = %s', (db_name,))
+    indexes = group_rows(cursor, rows, show_index_columns,
+                         show_index_longs)[1]
+    schema = {}
+    for table in tables:
+        schema[table] = (columns[table], indexes.get(table, []))
+    return schema
+
+# Capture the schema of database db_name over an open connection.
+# With bulk true, use bulk_schema (which needs MySQL 5.0 or later)
+# rather than describe_schema, putting the physical metadata in
+# physical if that is a map.
+
+def capture_schema(db, db_name, bulk=False, physical=None):
+    db.select_db(db_name)
+    cursor = db.cursor()
+    try:
+        if bulk:
+            return bulk_schema(cursor, db_name, physical)
+        else:
+            return describe_schema(cursor, db_name)
+    finally:
+        cursor.close()
+
+connect_args = {'user': 'bugs'}
+
+def connect():
+    return MySQLdb.connect(**connect_args)
+
+# Capture the schema of database db_name as schema_version, and write
+# it to a pickle, unless an existing pickle has the same schema (see
+# get_schema.save_schema).  With bulk true, also keep the physical
+# metadata.  Prints the entry for schema_remarks.version_schema_map,
+# and returns the pickle name.
+
+def pickle_schema(schema_version, db_name, bulk=False):
+    physical = None
+    if bulk:
+        physical = {}
+    db = connect()
+    try:
+        schema = capture_schema(db, db_name, bulk, physical)
+    finally:
+        db.close()
+    name = get_schema.save_schema(schema_version, schema, physical=physical)
+    print get_schema.version_map_entry(schema_version, name)
+    return name
+
+# 2. Capturing many schemas at once.
+#
+# pickle_schemas captures the schemas of a list of (schema_version,
+# db_name) pairs, several at a time, over a pool of at most
+# 'connections' connections to the server (each capture selects its
+# own database).  When all the captures have finished, the schemas are
+# saved in the order given (so that of several identical schemas, the
+# first is kept), and the manifest is written once.  It prints and
+# returns a list of (schema_version, db_name, seconds, error, name) in
+# the order given, where error is None if the capture succeeded and
+# name is the pickle which schema_version uses.  Then it prints the
+# entries for schema_remarks.version_schema_map.
+
+# A connection_pool may be shared by several threads.  A thread which
+# finds every connection in use waits on condition until one is put
+# back or discarded (which makes room for a new one).
+
+class connection_pool:
+    def __init__(self, size, connect=connect):
+        self.size = size
+        self.connect = connect
+        self.idle = []
+        self.opened = 0
+        self.condition = threading.Condition()
+
+    # Get an idle connection, opening a new one if fewer than size are
+    # open, or else waiting for one to be put back or discarded.
+
+    def get(self):
+        self.condition.acquire()
+        try:
+            while not self.idle and self.opened >= self.size:
+                self.condition.wait()
+            if self.idle:
+                return self.idle.pop()
+            self.opened = self.opened + 1
+        finally:
+            self.condition.release()
+        try:
+            return self.connect()
+        except:
+            self.discard(None)
+            raise
+
+    def put(self, db):
+        self.condition.acquire()
+        try:
+            self.idle.append(db)
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    # Forget a connection which has gone wrong, so that another can be
+    # opened in its place.
+
+    def discard(self, db):
+        self.condition.acquire()
+        try:
+            self.opened = self.opened - 1
+            self.condition.notify()
+        finally:
+            self.condition.release()
+        if db is not None:
+            try:
+                db.close()
+            except Exception:
+                pass
+
+    def close(self):
+        self.condition.acquire()
+        try:
+            idle = self.idle
+            self.idle = []
+        finally:
+            self.condition.release()
+        for db in idle:
+            self.discard(db)
+
+def capture_one(pool, schema_version, db_name, bulk):
+    start = time.time()
+    physical = None
+    if bulk:
+        physical = {}
+    try:
+        db = pool.get()
+        try:
+            schema = capture_schema(db, db_name, bulk, physical)
+        except:
+            pool.discard(db)
+            raise
+        pool.put(db)
+        e = None
+    except Exception, e:
+        schema = None
+        e = str(e) or e.__class__.__name__
+    return (schema_version, db_name, time.time() - start, e,
+            (schema, physical))
+
+def pickle_schemas(pairs, connections=4, bulk=False, pool=None):
+    if pool is None:
+        pool = connection_pool(connections)
+    jobs = Queue.Queue()
+    for i in range(len(pairs)):
+        jobs.put(i)
+    results = [None] * len(pairs)
+    def work():
+        while 1:
+            try:
+                i = jobs.get_nowait()
+            except Queue.Empty:
+                return
+            (schema_version, db_name) = pairs[i]
+            results[i] = capture_one(pool, schema_version, db_name, bulk)
+    start = time.time()
+    threads = []
+    for i in range(min(pool.size, len(pairs))):
+        t = threading.Thread(target=work)
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    pool.close()
+    for i in range(len(results)):
+        (schema_version, db_name, seconds, e, (schema, physical)) = results[i]
+        name = None
+        if e is None:
+            name = get_schema.save_schema(schema_version, schema,
+                                          manifest=0, physical=physical)
+        results[i] = (schema_version, db_name, seconds, e, name)
+    schema_store.write_manifest()
+    for (schema_version, db_name, seconds, e, name) in results:
+        if e is not None:
+            print '%-12s %-20s %7.3fs  FAILED: %s' % (schema_version, db_name,
+                                                     seconds, e)
+        elif name != schema_version:
+            print '%-12s %-20s %7.3fs  same as %s' % (schema_version, db_name,
+                                                     seconds, name)
+        else:
+            print '%-12s %-20s %7.3fs' % (schema_version, db_name, seconds)
+    print '%d databases in %.3fs over %d connections' % (
+        len(pairs), time.time() - start, pool.size)
+    for (schema_version, db_name, seconds, e, name) in results:
+        if name is not None:
+            print get_schema.version_map_entry(schema_version, name)
+    return results
+
+# 3. Capturing production sizes.
+#
+# pickle_sizes records the sizes of the tables and indexes in database
+# db_name, which runs Bugzilla version bugzilla_version, beside the
+# pickle of that version's schema (see schema_store.py, section 8).
+# It needs MySQL 5.0 or later, and returns the sizes.
+
+def capture_sizes(cursor, db_name):
+    rows = select_rows(cursor,
+                       'select TABLE_NAME, TABLE_ROWS, DATA_LENGTH, '
+                       'INDEX_LENGTH from information_schema.TABLES '
+                       'where TABLE_SCHEMA = %s', (db_name,))
+    sizes = {}
+    for (table, table_rows, data_length, index_length) in rows:
+        sizes[table] = {'Rows': table_rows,
+                        'Data_length': data_length,
+                        'Index_length': index_length,
+                        'Indexes': {}}
+    # The cardinality of an index is that of its last column.
+    rows = select_rows(cursor,
+                       'select TABLE_NAME, INDEX_NAME, CARDINALITY '
+                       'from information_schema.STATISTICS '
+                       'where TABLE_SCHEMA = %s '
+                       'order by TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX',
+                       (db_name,))
+    for (table, index, cardinality) in rows:
+        if sizes.has_key(table):
+            sizes[table]['Indexes'][index] = cardinality
+    return sizes
+
+def pickle_sizes(bugzilla_version, db_name):
+    if not schema_remarks.version_schema_map.has_key(bugzilla_version):
+        raise error, "I don't know about version '%s'." % bugzilla_version
+    db = connect()
+    try:
+        cursor = db.cursor()
+        try:
+            sizes = capture_sizes(cursor, db_name)
+        finally:
+            cursor.close()
+    finally:
+        db.close()
+    schema_store.write_sizes(
+        schema_remarks.version_schema_map[bugzilla_version],
+        bugzilla_version, sizes)
+    return sizes
+
 # A. REFERENCES
 #
 #
 # B. DOCUMENT HISTORY
 #
 # 2004-11-11 NB  Created, partly from make_schema_doc.py.
+# 2026-10-17     Regenerate the pickle manifest after making a pickle.
+#                Add bulk capture from information_schema, and
+#                concurrent capture of many databases.  Keep no
+#                pickle which duplicates an existing one.  Capture
+#                physical metadata with the bulk queries.  Record
+#                the sizes of a production database.
 # 
 #
 # C. COPYRIGHT AND LICENSE
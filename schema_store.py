@@ -0,0 +1,780 @@
+#             Perforce Defect Tracking Integration Project
+#              <http://www.ravenbrook.com/project/p4dti/>
+#
+#           SCHEMA_STORE.PY -- READ AND WRITE STORED SCHEMAS
+#
+#             Ravenbrook Limited, 2026-10-17
+#
+#
+# 1. INTRODUCTION
+#
+# This module reads the raw schemas captured by pickle_schema.py.
+# Each schema is kept as a protocol-0 pickle in its own file in the
+# 'pickles' subdirectory, and a manifest records the hash and size of
+# each pickle, so that a damaged pickle is found before it is used.
+# Parsing those text pickles is most of the
+# cost of a cold process, so all of them can also be gathered into a
+# single binary archive, which is read in preference to the pickles
+# and which can be read one table at a time.  Alternatively, they can
+# be kept as a delta store, which holds occasional snapshots and the
+# differences between consecutive schemas.
+#
+# The intended readership is project developers.
+#
+# This document is not confidential.
+
+import cPickle
+from hashlib import md5
+import mmap
+import os
+import struct
+import tempfile
+import types
+
+import schema_remarks
+
+error = 'storing a schema'
+
+pickle_dir = 'pickles'
+manifest_path = 'pickles.manifest'
+verified_path = 'pickles.verified'
+archive_path = 'schemas.archive'
+physical_dir = 'physical'
+sizes_dir = 'sizes'
+
+# 2. Individual pickles.
+#
+# Each file in pickle_dir holds a pickled pair (schema_version,
+# schema), where schema is a map from table name to (columns,
+# indexes): the rows returned by 'describe' and 'show index'.
+
+def pickle_path(schema_version):
+    return os.path.join(pickle_dir, schema_version)
+
+def load_pickle(schema_version):
+    check_pickle(schema_version)
+    f = open(pickle_path(schema_version), 'r')
+    try:
+        return cPickle.load(f)
+    finally:
+        f.close()
+
+# Write a captured schema to its pickle.  The pickle is written
+# atomically, so a reader never sees half a pickle.
+
+def write_pickle(schema_version, schema):
+    write_atomically(pickle_path(schema_version),
+                     cPickle.dumps((schema_version, schema)), 'w')
+
+# Hashes of file contents, used to tell when derived files such as the
+# archive or cached reduced schemas are out of date.
+
+def file_hash(path):
+    f = open(path, 'rb')
+    try:
+        return md5(f.read()).hexdigest()
+    finally:
+        f.close()
+
+def pickle_hash(schema_version):
+    return file_hash(pickle_path(schema_version))
+
+# The hash of a module's source file (rather than of its compiled
+# file, which may be rewritten with the same meaning).
+
+def source_hash(module):
+    path = module.__file__
+    if path[-4:] in ('.pyc', '.pyo') and os.path.exists(path[:-1]):
+        path = path[:-1]
+    return file_hash(path)
+
+# Write a file atomically: readers see either the old contents or the
+# new contents, never a partial file.
+
+def write_atomically(path, data, mode='wb'):
+    (fd, temp) = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                  prefix='.tmp-')
+    try:
+        f = os.fdopen(fd, mode)
+        f.write(data)
+        f.close()
+        os.chmod(temp, 0644)
+        os.rename(temp, path)
+    except:
+        os.unlink(temp)
+        raise
+
+# The names of all the pickles in pickle_dir, whether or not
+# schema_remarks.py maps any version to them yet.
+
+def pickle_names():
+    names = filter(lambda n: n[:1] != '.', os.listdir(pickle_dir))
+    names.sort()
+    return names
+
+# The names of all the schemas we know about, in version order.
+
+def schema_names():
+    names = []
+    for v in schema_remarks.version_order:
+        name = schema_remarks.version_schema_map[v]
+        if name not in names:
+            names.append(name)
+    return names
+
+# 3. The manifest.
+#
+# The manifest, in manifest_path, lists every pickle in pickle_dir,
+# one per line, as
+#
+#   md5-hash size schema-version
+#
+# It is kept in Git alongside the pickles, and must be regenerated
+# (with write_manifest) whenever a pickle is added or changed.
+#
+# A pickle is checked against the manifest whenever it is loaded.  A
+# pickle of the wrong size is rejected at once.  Otherwise, if the
+# pickle's size and modification time are the ones at which we last
+# found its hash matched the manifest, we trust it; if not, we hash it
+# again.  Those sizes and times are kept in verified_path (which is not
+# kept in Git, as checking out a file changes its time).
+#
+# The manifest is also what says whether a derived file (the archive,
+# the delta store, or a cached reduced schema) is out of date: each
+# records the hashes of the pickles it was made from, which are
+# compared with the manifest, so no pickle need be read or hashed to
+# use them.  If there is no manifest, pickles are not checked, and
+# schema_hash hashes the pickle itself.
+
+manifest_header = ('# Bugzilla schema pickles: MD5 hash, size in bytes, '
+                   'schema version.\n')
+
+# Regenerate the manifest from the pickles in pickle_dir.  Each pickle
+# must hold the schema it is named after.
+
+def write_manifest(path=None):
+    if path is None:
+        path = manifest_path
+    lines = [manifest_header]
+    for name in pickle_names():
+        f = open(pickle_path(name), 'rb')
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        (sv, schema) = cPickle.loads(data)
+        if sv != name:
+            raise error, ("Pickle '%s' holds schema '%s'." % (name, sv))
+        lines.append('%s %d %s\n' % (md5(data).hexdigest(), len(data), name))
+    write_atomically(path, ''.join(lines), 'w')
+    reset_manifest()
+
+# Read the manifest, as a map from schema version to (hash, size), or
+# None if there is no manifest.
+
+def read_manifest(path=None):
+    if path is None:
+        path = manifest_path
+    if not os.path.exists(path):
+        return None
+    manifest = {}
+    f = open(path, 'r')
+    try:
+        for line in f.readlines():
+            if line[:1] == '#' or not line.strip():
+                continue
+            (digest, size, name) = line.split()
+            manifest[name] = (digest, int(size))
+    finally:
+        f.close()
+    return manifest
+
+# The manifest and the verified times are read at most once per
+# process.  None means we have not looked yet; False means there is no
+# manifest.
+
+the_manifest = None
+the_verified = None
+
+def get_manifest():
+    global the_manifest
+    if the_manifest is None:
+        the_manifest = read_manifest() or False
+    return the_manifest
+
+def reset_manifest():
+    global the_manifest, the_verified
+    the_manifest = None
+    the_verified = None
+
+def get_verified():
+    global the_verified
+    if the_verified is None:
+        the_verified = {}
+        try:
+            f = open(verified_path, 'rb')
+            try:
+                the_verified = cPickle.load(f)
+            finally:
+                f.close()
+        except (IOError, EOFError, cPickle.UnpicklingError):
+            pass
+    return the_verified
+
+# Failing to record a verified time just means that the pickle is
+# hashed again next time.
+
+def record_verified(schema_version, stamp):
+    verified = get_verified()
+    verified[schema_version] = stamp
+    try:
+        write_atomically(verified_path, cPickle.dumps(verified, 2))
+    except (IOError, OSError):
+        pass
+
+# Check a pickle against the manifest, raising error if it does not
+# match.
+
+def check_pickle(schema_version):
+    manifest = get_manifest()
+    if not manifest:
+        return
+    if not manifest.has_key(schema_version):
+        raise error, ("Pickle '%s' is not in the manifest '%s': "
+                      "regenerate it with schema_store.write_manifest()."
+                      % (schema_version, manifest_path))
+    (digest, size) = manifest[schema_version]
+    path = pickle_path(schema_version)
+    st = os.stat(path)
+    if st.st_size != size:
+        raise error, ("Pickle '%s' is %d bytes long, but the manifest "
+                      "says %d." % (path, st.st_size, size))
+    stamp = (digest, size, st.st_mtime)
+    if get_verified().get(schema_version) == stamp:
+        return
+    if file_hash(path) != digest:
+        raise error, ("Pickle '%s' does not match its hash in the "
+                      "manifest." % path)
+    record_verified(schema_version, stamp)
+
+# The hash of a schema's pickle, as recorded in the manifest.
+
+def schema_hash(schema_version):
+    manifest = get_manifest()
+    if manifest and manifest.has_key(schema_version):
+        return manifest[schema_version][0]
+    return pickle_hash(schema_version)
+
+# 4. The archive.
+#
+# The archive is a single file holding every table of every schema in
+# binary (protocol 2) pickles:
+#
+#   archive_magic
+#   index length (4 bytes, big-endian)
+#   index: a pickled pair (hashes, tables), where hashes maps each
+#          schema version to the hash of the pickle it came from, and
+#          tables maps each schema version to a map from table name to
+#          (offset, length)
+#   one pickled (columns, indexes) pair for each table of each schema
+#
+# Offsets are from the end of the index.  The archive is memory-mapped,
+# so a reader only unpickles the index and the tables it actually asks
+# for, and processes reading the same archive share its pages.  A
+# schema whose hash is not the one in the manifest is out of date, and
+# the archive does not have it.
+
+archive_magic = 'BZSCHEMA-ARCHIVE-3\n'
+
+def build_archive(names=None, path=None):
+    if names is None:
+        names = schema_names()
+    if path is None:
+        path = archive_path
+    hashes = {}
+    index = {}
+    blobs = []
+    offset = 0
+    for name in names:
+        (sv, schema) = load_pickle(name)
+        if sv != name:
+            raise error, ("Pickle '%s' holds schema '%s'." % (name, sv))
+        hashes[name] = schema_hash(name)
+        index[name] = {}
+        tables = schema.keys()
+        tables.sort()
+        for table in tables:
+            blob = cPickle.dumps(schema[table], 2)
+            index[name][table] = (offset, len(blob))
+            offset = offset + len(blob)
+            blobs.append(blob)
+    index_blob = cPickle.dumps((hashes, index), 2)
+    data = [archive_magic, struct.pack('>I', len(index_blob)), index_blob]
+    write_atomically(path, ''.join(data + blobs))
+    reset_archive()
+    verify_archive(names, path)
+
+# Check that every schema in the archive is identical to its pickle.
+
+def verify_archive(names=None, path=None):
+    if names is None:
+        names = schema_names()
+    a = archive(path or archive_path)
+    try:
+        if a.index is None:
+            raise error, "'%s' is not a schema archive." % a.path
+        for name in names:
+            if not a.has_schema(name):
+                raise error, ("Archive '%s' is out of date for pickle '%s'."
+                              % (a.path, name))
+            if a.load(name) != load_pickle(name):
+                raise error, ("Archive '%s' does not match pickle '%s'."
+                              % (a.path, name))
+    finally:
+        a.close()
+
+# An archive object maps the archive file.  If the file is not an
+# archive in the current format, its index is None.
+
+class archive:
+    def __init__(self, path):
+        self.path = path
+        self.index = None
+        f = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        header = len(archive_magic) + 4
+        if self.map[:len(archive_magic)] != archive_magic:
+            return
+        (length,) = struct.unpack('>I', self.map[len(archive_magic):header])
+        (self.hashes, self.index) = cPickle.loads(self.map[header:header + length])
+        self.base = header + length
+        self.current = {}
+
+    def has_schema(self, schema_version):
+        if not self.current.has_key(schema_version):
+            self.current[schema_version] = (
+                self.index.has_key(schema_version) and
+                self.hashes[schema_version] == schema_hash(schema_version))
+        return self.current[schema_version]
+
+    def tables(self, schema_version):
+        return self.index[schema_version].keys()
+
+    def load_table(self, schema_version, table):
+        (offset, length) = self.index[schema_version][table]
+        start = self.base + offset
+        return cPickle.loads(self.map[start:start + length])
+
+    def load(self, schema_version):
+        schema = {}
+        for table in self.index[schema_version].keys():
+            schema[table] = self.load_table(schema_version, table)
+        return (schema_version, schema)
+
+    def close(self):
+        self.map.close()
+
+# The archive is opened at most once per process.  None means we have
+# not looked yet; False means there is no usable archive.
+
+the_archive = None
+
+def get_archive():
+    global the_archive
+    if the_archive is None:
+        the_archive = False
+        if os.path.exists(archive_path):
+            a = archive(archive_path)
+            if a.index is None:
+                a.close()
+            else:
+                the_archive = a
+    return the_archive
+
+def reset_archive():
+    global the_archive
+    if the_archive:
+        the_archive.close()
+    the_archive = None
+
+# 5. The delta store.
+#
+# Consecutive schemas mostly differ by a handful of columns or
+# indexes, so the delta store keeps a full snapshot of a schema only
+# every checkpoint_interval schemas (in version order), and otherwise
+# keeps a delta from the previous schema.  Reconstructing a schema
+# starts at the nearest earlier snapshot, so never applies more than
+# checkpoint_interval - 1 deltas.
+#
+# The delta store file is a pickled map with these entries:
+#
+#   'names':    the schema versions, in order;
+#   'interval': the checkpoint interval;
+#   'entries':  a map from schema version to a binary pickle of either
+#               ('snapshot', schema) or ('delta', table_delta);
+#   'hashes':   a map from schema version to the hash of the pickle it
+#               came from (see section 3).
+#
+# Entries are pickled separately so that reconstruction only
+# unpickles the entries on its chain, and gets fresh objects each
+# time.
+#
+# A table_delta is a map with these entries:
+#
+#   'removed': a list of tables removed;
+#   'added':   a map from added table name to (columns, indexes);
+#   'changed': a map from changed table name to (column_delta,
+#              index_delta).
+#
+# A row delta (column_delta or index_delta) is a triple (removed,
+# rows, order): the keys of removed rows, the rows which are new or
+# changed, and either None or the list of keys in their new order, if
+# applying the delta would not otherwise get the order right.
+
+delta_path = 'schemas.delta'
+checkpoint_interval = 8
+
+def column_key(row):
+    return row['Field']
+
+def index_key(row):
+    return (row['Key_name'], row['Seq_in_index'])
+
+def apply_row_delta(rows, delta, key):
+    (removed, changed, order) = delta
+    changes = {}
+    for r in changed:
+        changes[key(r)] = r
+    result = []
+    for r in rows:
+        k = key(r)
+        if k not in removed:
+            result.append(changes.pop(k, r))
+    for r in changed:
+        if changes.has_key(key(r)):
+            result.append(r)
+    if order is not None:
+        by_key = {}
+        for r in result:
+            by_key[key(r)] = r
+        result = map(lambda k, m=by_key: m[k], order)
+    return result
+
+def make_row_delta(old, new, key):
+    old_rows = {}
+    for r in old:
+        old_rows[key(r)] = r
+    new_keys = map(key, new)
+    removed = []
+    for r in old:
+        if key(r) not in new_keys:
+            removed.append(key(r))
+    changed = []
+    for r in new:
+        if old_rows.get(key(r)) != r:
+            changed.append(r)
+    delta = (removed, changed, None)
+    if map(key, apply_row_delta(old, delta, key)) != new_keys:
+        delta = (removed, changed, new_keys)
+    return delta
+
+def make_table_delta(old, new):
+    delta = {'removed': [], 'added': {}, 'changed': {}}
+    for table in old.keys():
+        if not new.has_key(table):
+            delta['removed'].append(table)
+    for table in new.keys():
+        if not old.has_key(table):
+            delta['added'][table] = new[table]
+        elif old[table] != new[table]:
+            (old_columns, old_indexes) = old[table]
+            (columns, indexes) = new[table]
+            delta['changed'][table] = (
+                make_row_delta(old_columns, columns, column_key),
+                make_row_delta(old_indexes, indexes, index_key))
+    return delta
+
+def apply_table_delta(schema, delta):
+    for table in delta['removed']:
+        del schema[table]
+    for (table, t) in delta['added'].items():
+        schema[table] = t
+    for (table, (column_delta, index_delta)) in delta['changed'].items():
+        (columns, indexes) = schema[table]
+        schema[table] = (apply_row_delta(columns, column_delta, column_key),
+                         apply_row_delta(indexes, index_delta, index_key))
+    return schema
+
+def build_delta_store(names=None, path=None, interval=None):
+    if names is None:
+        names = schema_names()
+    if path is None:
+        path = delta_path
+    if interval is None:
+        interval = checkpoint_interval
+    entries = {}
+    hashes = {}
+    previous = None
+    for i in range(len(names)):
+        (sv, schema) = load_pickle(names[i])
+        if i % interval == 0:
+            entry = ('snapshot', schema)
+        else:
+            entry = ('delta', make_table_delta(previous, schema))
+        entries[names[i]] = cPickle.dumps(entry, 2)
+        hashes[names[i]] = schema_hash(names[i])
+        previous = schema
+    store = {'names': names, 'interval': interval, 'entries': entries,
+             'hashes': hashes}
+    write_atomically(path, cPickle.dumps(store, 2))
+    reset_delta_store()
+    verify_delta_store(names, path)
+
+def verify_delta_store(names=None, path=None):
+    if names is None:
+        names = schema_names()
+    d = delta_store(path or delta_path)
+    for name in names:
+        if not d.has_schema(name):
+            raise error, ("Delta store '%s' is out of date for pickle '%s'."
+                          % (d.path, name))
+        if d.load(name) != load_pickle(name):
+            raise error, ("Delta store '%s' does not match pickle '%s'."
+                          % (d.path, name))
+
+class delta_store:
+    def __init__(self, path):
+        self.path = path
+        f = open(path, 'rb')
+        try:
+            store = cPickle.load(f)
+        finally:
+            f.close()
+        self.names = store['names']
+        self.interval = store['interval']
+        self.entries = store['entries']
+        self.hashes = store.get('hashes', {})
+        self.position = {}
+        for i in range(len(self.names)):
+            self.position[self.names[i]] = i
+        self.current = {}
+
+    def has_schema(self, schema_version):
+        if not self.current.has_key(schema_version):
+            self.current[schema_version] = (
+                self.position.has_key(schema_version) and
+                self.hashes.get(schema_version) == schema_hash(schema_version))
+        return self.current[schema_version]
+
+    def load(self, schema_version):
+        i = self.position[schema_version]
+        checkpoint = i - i % self.interval
+        (kind, schema) = cPickle.loads(self.entries[self.names[checkpoint]])
+        for name in self.names[checkpoint + 1 : i + 1]:
+            (kind, delta) = cPickle.loads(self.entries[name])
+            apply_table_delta(schema, delta)
+        return (schema_version, schema)
+
+the_delta_store = None
+
+def get_delta_store():
+    global the_delta_store
+    if the_delta_store is None:
+        if os.path.exists(delta_path):
+            the_delta_store = delta_store(delta_path)
+        else:
+            the_delta_store = False
+    return the_delta_store
+
+def reset_delta_store():
+    global the_delta_store
+    the_delta_store = None
+
+# 6. Loading a schema.
+#
+# store says where schemas are read from:
+#
+#   'archive': the archive (section 4);
+#   'delta':   the delta store (section 5);
+#   'pickles': the individual pickles (section 2).
+#
+# Any schema which is not in the archive or delta store, or whose
+# pickle has changed since the archive or delta store was built, is
+# read from its pickle.
+
+store = 'archive'
+
+# Return the (schema_version, schema) pair for a schema version.
+
+def load_schema(schema_version):
+    if store == 'archive':
+        a = get_archive()
+        if a and a.has_schema(schema_version):
+            return a.load(schema_version)
+    elif store == 'delta':
+        d = get_delta_store()
+        if d and d.has_schema(schema_version):
+            return d.load(schema_version)
+    return load_pickle(schema_version)
+
+# Return whether the tables of a schema version can be loaded one at a
+# time (from the archive) without loading the whole schema.
+
+def has_tables(schema_version):
+    if store == 'archive':
+        a = get_archive()
+        if a and a.has_schema(schema_version):
+            return 1
+    return 0
+
+# Return the names of the tables in a schema version.
+
+def load_table_names(schema_version):
+    if store == 'archive':
+        a = get_archive()
+        if a and a.has_schema(schema_version):
+            return a.tables(schema_version)
+    return load_schema(schema_version)[1].keys()
+
+# Return the raw (columns, indexes) of one table in a schema version,
+# or None if the schema has no such table.  From the archive, this
+# touches only that table's bytes.
+
+def load_table(schema_version, table):
+    if store == 'archive':
+        a = get_archive()
+        if a and a.has_schema(schema_version):
+            if not a.index[schema_version].has_key(table):
+                return None
+            return a.load_table(schema_version, table)
+    return load_schema(schema_version)[1].get(table)
+
+# 7. Physical metadata.
+#
+# A schema captured from information_schema (see
+# pickle_schema.bulk_schema) also has physical metadata, which
+# 'describe' and 'show index' do not give: each table's storage
+# engine, row format and collation, the collation of each of its
+# character columns, and its foreign key constraints.  This is kept
+# beside the pickle, in a file of the same name in physical_dir, as a
+# pickled pair (schema_version, physical), where physical is a map
+# from table name to a map with these entries:
+#
+#   'Engine', 'Row_format', 'Collation': as in information_schema.TABLES;
+#   'Columns':      a map from column name to its collation;
+#   'Foreign_keys': a list of row dictionaries, one for each column of
+#                   each foreign key, with the entries 'Constraint_name',
+#                   'Column_name', 'Ordinal_position',
+#                   'Referenced_table', 'Referenced_column', 'On_update'
+#                   and 'On_delete'.
+#
+# Schemas captured in other ways have no physical metadata, and
+# nothing else depends on it, so the pickles are just as they were.
+
+def physical_path(schema_version):
+    return os.path.join(physical_dir, schema_version)
+
+def write_physical(schema_version, physical):
+    write_sidecar(physical_dir, schema_version, physical)
+
+# Return the physical metadata of a schema, or None if it has none.
+
+def load_physical(schema_version):
+    return load_sidecar(physical_dir, schema_version)
+
+# Files kept beside the pickles, in their own directories, are pickled
+# pairs (schema_version, data), like the pickles.
+
+def write_sidecar(directory, schema_version, data):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    write_atomically(os.path.join(directory, schema_version),
+                     cPickle.dumps((schema_version, data)), 'w')
+
+def load_sidecar(directory, schema_version):
+    path = os.path.join(directory, schema_version)
+    if not os.path.exists(path):
+        return None
+    f = open(path, 'r')
+    try:
+        (sv, data) = cPickle.load(f)
+    finally:
+        f.close()
+    if sv != schema_version:
+        raise error, "File '%s' is for schema '%s'." % (path, sv)
+    return data
+
+# 8. Production sizes.
+#
+# pickle_schema.pickle_sizes records the sizes of the tables in a
+# working Bugzilla database (for instance, a site's production
+# database), so that the schema doc can show them.  They are kept in
+# a file in sizes_dir named after the schema of that database, as a
+# pickled pair (schema_version, (bugzilla_version, sizes)), where
+# bugzilla_version is the version the database was running (several
+# versions may share a schema), and sizes is a map from table name to
+# a map with these entries:
+#
+#   'Rows':         the number of rows (an estimate, for InnoDB);
+#   'Data_length':  the size of the data, in bytes;
+#   'Index_length': the size of the indexes, in bytes;
+#   'Indexes':      a map from index name to its cardinality.
+#
+# These are a site's own figures, so sizes_dir is not kept in Git.
+
+def write_sizes(schema_version, bugzilla_version, sizes):
+    write_sidecar(sizes_dir, schema_version, (bugzilla_version, sizes))
+
+# Return the pair (bugzilla_version, sizes) recorded for a schema, or
+# None if there are none.  Files written before the Bugzilla version
+# was recorded hold just the sizes, and give None for the version.
+
+def load_sizes(schema_version):
+    data = load_sidecar(sizes_dir, schema_version)
+    if data is None or type(data) is types.TupleType:
+        return data
+    return (None, data)
+
+# A. REFERENCES
+#
+#
+# B. DOCUMENT HISTORY
+#
+# 2026-10-17 Created, taking pickle loading from get_schema.py.
+#
+#
+# C. COPYRIGHT AND LICENSE
+#
+# This file is copyright (c) 2026 Perforce Software, Inc.  All rights
+# reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1.  Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+# 2.  Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# HOLDERS AND CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS
+# OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR
+# TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGE.
+#
+#
+# $Id$
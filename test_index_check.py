@@ -0,0 +1,94 @@
+#             Perforce Defect Tracking Integration Project
+#              <http://www.ravenbrook.com/project/p4dti/>
+#
+#     TEST_INDEX_CHECK.PY -- TEST THE FOREIGN KEYS FOUND BY INDEX_CHECK
+#
+#             Ravenbrook Limited, 2026-10-17
+#
+#
+# 1. INTRODUCTION
+#
+# This module checks that index_check.py finds every foreign key in the
+# column remarks, however the remark spells 'foreign key'.  Run it from
+# the top directory:
+#
+#   python test_index_check.py
+#
+# The intended readership is project developers.
+#
+# This document is not confidential.
+
+import re
+import unittest
+
+import index_check
+import schema_remarks
+
+# 2. Counting the remarks.
+#
+# We count the foreign key references in the remark texts directly, in
+# each spelling, and compare with the edges which index_check extracts.
+
+reference_re = re.compile('(foreign key) %\\(column-[^)]+\\)s', re.IGNORECASE)
+
+def count_spellings():
+    counts = {}
+    for remarks in schema_remarks.column_remark.values():
+        for remark in remarks.values():
+            for (first, last, text) in index_check.remark_texts(remark):
+                for m in reference_re.finditer(text):
+                    counts[m.group(1)] = counts.get(m.group(1), 0) + 1
+    return counts
+
+class foreign_keys(unittest.TestCase):
+    def test_both_spellings(self):
+        counts = count_spellings()
+        self.failUnless(counts.get('foreign key', 0) > 0)
+        self.failUnless(counts.get('Foreign key', 0) > 0)
+        edges = index_check.extract_foreign_keys()
+        total = 0
+        for count in counts.values():
+            total = total + count
+        self.assertEqual(len(edges), total)
+
+    def test_capitalized(self):
+        edges = index_check.extract_foreign_keys()
+        found = {}
+        for (table, column, ref_table, ref_column, first, last) in edges:
+            found[(table, column)] = (ref_table, ref_column)
+        self.assertEqual(found.get(('fielddefs', 'visibility_field_id')),
+                         ('fielddefs', 'id'))
+
+if __name__ == '__main__':
+    unittest.main()
+
+# This file is copyright (c) 2026 Perforce Software, Inc.  All rights
+# reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1.  Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+# 2.  Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# HOLDERS AND CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS
+# OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR
+# TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGE.
+#
+#
+# $Id$
@@ -0,0 +1,369 @@
+#             Perforce Defect Tracking Integration Project
+#              <http://www.ravenbrook.com/project/p4dti/>
+#
+#    TEST_PICKLE_SCHEMA.PY -- TEST SCHEMA CAPTURE WITHOUT A DATABASE
+#
+#             Ravenbrook Limited, 2026-10-17
+#
+#
+# 1. INTRODUCTION
+#
+# This module tests pickle_schema.py against a fake database, which
+# answers the queries that pickle_schema.py makes from a fixed schema
+# of two tables, and against a fake server, which opens as many fake
+# databases as it is asked to.  Run it from the top directory:
+#
+#   python test_pickle_schema.py
+#
+# It needs no MySQL server.  MySQLdb is only used to connect, so if it
+# is not installed we give pickle_schema.py an empty module in its
+# place.
+#
+# The intended readership is project developers.
+#
+# This document is not confidential.
+
+import cPickle
+import StringIO
+import sys
+import threading
+import time
+import types
+import unittest
+
+try:
+    import MySQLdb
+except ImportError:
+    sys.modules['MySQLdb'] = types.ModuleType('MySQLdb')
+
+import get_schema
+import pickle_schema
+import schema_store
+
+# 2. The fake database.
+#
+# columns maps each table to its rows from 'describe', and indexes to
+# its rows from 'show index', in the order MySQL gives them.  MySQLdb
+# makes new strings for the column names and values of every result,
+# so the fake cursor does too, or the pickles would share strings
+# which real results do not.
+
+describe_keys = ['Field', 'Type', 'Null', 'Key', 'Default', 'Extra']
+
+columns = {
+    'bugs': [
+        ('bug_id', 'mediumint(9)', 'NO', 'PRI', None, 'auto_increment'),
+        ('assigned_to', 'mediumint(9)', 'NO', 'MUL', '0', ''),
+        ('short_desc', 'varchar(255)', 'NO', 'MUL', '', ''),
+        ],
+    'longdescs': [
+        ('comment_id', 'int(11)', 'NO', 'PRI', None, 'auto_increment'),
+        ('bug_id', 'mediumint(9)', 'NO', 'MUL', '0', ''),
+        ('thetext', 'mediumtext', 'NO', 'MUL', None, ''),
+        ],
+    }
+
+show_index_keys = ['Table', 'Non_unique', 'Key_name', 'Seq_in_index',
+                   'Column_name', 'Collation', 'Cardinality', 'Sub_part',
+                   'Packed', 'Null', 'Index_type', 'Comment',
+                   'Index_comment']
+
+indexes = {
+    'bugs': [
+        ('bugs', 0L, 'PRIMARY', 1L, 'bug_id', 'A', 2L, None, None, '',
+         'BTREE', '', ''),
+        ('bugs', 1L, 'assigned_to', 1L, 'assigned_to', 'A', 2L, None,
+         None, '', 'BTREE', '', ''),
+        ('bugs', 1L, 'short_desc', 1L, 'short_desc', None, None, None,
+         None, '', 'FULLTEXT', '', ''),
+        ],
+    'longdescs': [
+        ('longdescs', 0L, 'PRIMARY', 1L, 'comment_id', 'A', 4L, None,
+         None, '', 'BTREE', '', ''),
+        ('longdescs', 1L, 'bug_id', 1L, 'bug_id', 'A', 2L, None, None,
+         '', 'BTREE', '', ''),
+        ('longdescs', 1L, 'thetext', 1L, 'thetext', None, None, 255L,
+         None, '', 'FULLTEXT', '', ''),
+        ],
+    }
+
+def fresh(value):
+    if type(value) is types.StringType:
+        return value[:1] + value[1:]
+    return value
+
+# The rows of information_schema.COLUMNS and STATISTICS, which give
+# numbers as ints rather than longs.
+
+def columns_rows():
+    keys = ['TABLE_NAME', 'COLUMN_NAME', 'ORDINAL_POSITION',
+            'COLUMN_DEFAULT', 'IS_NULLABLE', 'COLUMN_TYPE', 'COLUMN_KEY',
+            'EXTRA', 'COLLATION_NAME']
+    rows = []
+    tables = columns.keys()
+    tables.sort()
+    for table in tables:
+        for i in range(len(columns[table])):
+            (field, type, null, key, default, extra) = columns[table][i]
+            rows.append((table, field, i + 1, default, null, type, key,
+                         extra, None))
+    return (keys, rows)
+
+def statistics_rows(interleaved):
+    keys = ['TABLE_NAME', 'NON_UNIQUE', 'INDEX_NAME', 'SEQ_IN_INDEX',
+            'COLUMN_NAME', 'COLLATION', 'CARDINALITY', 'SUB_PART',
+            'PACKED', 'NULLABLE', 'INDEX_TYPE', 'COMMENT', 'INDEX_COMMENT']
+    def convert(row):
+        result = []
+        for v in row:
+            if type(v) is types.LongType:
+                v = int(v)
+            result.append(v)
+        return tuple(result)
+    tables = indexes.keys()
+    tables.sort()
+    rows = []
+    if interleaved:
+        for i in range(max(map(len, indexes.values()))):
+            for table in tables:
+                if i < len(indexes[table]):
+                    rows.append(convert(indexes[table][i]))
+    else:
+        for table in tables:
+            rows.extend(map(convert, indexes[table]))
+    return (keys, rows)
+
+class fake_cursor:
+    def __init__(self, db):
+        self.db = db
+        self.description = None
+        self.rows = []
+
+    def execute(self, query, args=None):
+        if query == 'show tables':
+            tables = columns.keys()
+            tables.sort()
+            (keys, rows) = (['Tables_in_bugs'],
+                            map(lambda t: (t,), tables))
+        elif query.startswith('describe '):
+            (keys, rows) = (describe_keys, columns[query.split()[1]])
+        elif query.startswith('show index from '):
+            (keys, rows) = (show_index_keys, indexes[query.split()[3]])
+        elif 'information_schema.COLUMNS' in query:
+            (keys, rows) = columns_rows()
+        elif 'information_schema.STATISTICS' in query:
+            (keys, rows) = statistics_rows(self.db.interleaved)
+        else:
+            raise pickle_schema.error, "Unexpected query '%s'." % query
+        self.description = tuple(map(lambda k: (fresh(k),) + (None,) * 6,
+                                     keys))
+        self.rows = map(lambda r: tuple(map(fresh, r)), rows)
+        return len(rows)
+
+    def fetchall(self):
+        return tuple(self.rows)
+
+    def close(self):
+        pass
+
+class fake_db:
+    def __init__(self, interleaved=0):
+        self.interleaved = interleaved
+        self.db_name = None
+        self.closed = 0
+
+    def select_db(self, db_name):
+        self.db_name = db_name
+
+    def cursor(self):
+        return fake_cursor(self)
+
+    def close(self):
+        self.closed = 1
+
+# 3. Bulk capture.
+#
+# bulk_schema should make the same pickle as describe_schema, as long
+# as the server gives each table's index rows in the order of 'show
+# index', even if the rows of different tables are mixed together.
+
+def pickled(schema):
+    return cPickle.dumps(('3.4.2', schema))
+
+class bulk_capture(unittest.TestCase):
+    def check_same(self, interleaved):
+        described = pickle_schema.capture_schema(fake_db(), 'bugs')
+        bulk = pickle_schema.capture_schema(fake_db(interleaved), 'bugs',
+                                            bulk=True)
+        self.assertEqual(bulk, described)
+        self.assertEqual(pickled(bulk), pickled(described))
+
+    def test_same_pickle(self):
+        self.check_same(0)
+
+    def test_interleaved_tables(self):
+        self.check_same(1)
+
+# 4. Capturing many databases.
+#
+# A fake_server hands out fake databases, and counts how many are open
+# at once.  Selecting the database 'broken' fails, and each query
+# takes a little time, so that the captures overlap.  Saving schemas
+# and writing the manifest are replaced, so nothing is written.
+
+class slow_db(fake_db):
+    def __init__(self, server):
+        fake_db.__init__(self)
+        self.server = server
+
+    def select_db(self, db_name):
+        if db_name == 'broken':
+            raise pickle_schema.error, "Can't select database 'broken'."
+        fake_db.select_db(self, db_name)
+
+    def cursor(self):
+        time.sleep(0.005)
+        return fake_db.cursor(self)
+
+    def close(self):
+        if not self.closed:
+            self.server.closed(self)
+        fake_db.close(self)
+
+class fake_server:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = []
+        self.most = 0
+        self.connections = 0
+
+    def connect(self):
+        self.lock.acquire()
+        try:
+            db = slow_db(self)
+            self.open.append(db)
+            self.connections = self.connections + 1
+            self.most = max(self.most, len(self.open))
+        finally:
+            self.lock.release()
+        return db
+
+    def closed(self, db):
+        self.lock.acquire()
+        try:
+            self.open.remove(db)
+        finally:
+            self.lock.release()
+
+class batch_capture(unittest.TestCase):
+    def setUp(self):
+        self.saved = []
+        self.save_schema = get_schema.save_schema
+        self.write_manifest = schema_store.write_manifest
+        def save_schema(schema_version, schema, manifest=True,
+                        physical=None, saved=self.saved):
+            saved.append(schema_version)
+            return schema_version
+        get_schema.save_schema = save_schema
+        schema_store.write_manifest = lambda: None
+        self.stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+
+    def tearDown(self):
+        get_schema.save_schema = self.save_schema
+        schema_store.write_manifest = self.write_manifest
+        sys.stdout = self.stdout
+
+    def capture(self, pairs, size):
+        server = fake_server()
+        pool = pickle_schema.connection_pool(size, server.connect)
+        results = pickle_schema.pickle_schemas(pairs, pool=pool)
+        return (server, results, sys.stdout.getvalue())
+
+    def test_batch(self):
+        pairs = []
+        for i in range(12):
+            pairs.append(('3.%d' % i, 'bugs%d' % i))
+        pairs[5] = ('3.5', 'broken')
+        (server, results, output) = self.capture(pairs, 3)
+        # Results in the order given.
+        self.assertEqual(map(lambda r: (r[0], r[1]), results), pairs)
+        # The broken database fails; the others are saved.
+        for (schema_version, db_name, seconds, e, name) in results:
+            if db_name == 'broken':
+                self.failUnless(e is not None)
+                self.assertEqual(name, None)
+            else:
+                self.assertEqual(e, None)
+                self.assertEqual(name, schema_version)
+        self.assertEqual(self.saved, map(lambda (v, d): v,
+                                         pairs[:5] + pairs[6:]))
+        # Its connection is discarded, so one more is opened; no more
+        # than 3 are open at once, and all are closed at the end.
+        self.assertEqual(server.connections, 4)
+        self.failUnless(server.most <= 3)
+        self.assertEqual(server.open, [])
+        # A line with the time of each database.
+        for (schema_version, db_name) in pairs:
+            lines = filter(lambda l, v=schema_version, d=db_name:
+                           l.split()[:2] == [v, d], output.split('\n'))
+            self.assertEqual(len(lines), 1)
+            self.failUnless(lines[0].split()[2].endswith('s'))
+            float(lines[0].split()[2][:-1])
+            self.assertEqual(db_name == 'broken', 'FAILED' in lines[0])
+
+    # A thread waiting for a connection gets one when another thread
+    # discards its connection.
+
+    def test_discard_wakes(self):
+        server = fake_server()
+        pool = pickle_schema.connection_pool(1, server.connect)
+        db = pool.get()
+        got = []
+        t = threading.Thread(target=lambda: got.append(pool.get()))
+        t.setDaemon(1)
+        t.start()
+        time.sleep(0.05)
+        self.assertEqual(got, [])
+        pool.discard(db)
+        t.join(5)
+        self.failIf(t.isAlive())
+        self.assertEqual(len(got), 1)
+        self.failIf(got[0] is db)
+        pool.put(got[0])
+        pool.close()
+        self.assertEqual(server.open, [])
+
+if __name__ == '__main__':
+    unittest.main()
+
+# This file is copyright (c) 2026 Perforce Software, Inc.  All rights
+# reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1.  Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+# 2.  Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# HOLDERS AND CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS
+# OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR
+# TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGE.
+#
+#
+# $Id$
@@ -0,0 +1,383 @@
+#             Perforce Defect Tracking Integration Project
+#              <http://www.ravenbrook.com/project/p4dti/>
+#
+#       UPGRADE_COST.PY -- ESTIMATE THE COST OF A SCHEMA UPGRADE
+#
+#             Ravenbrook Limited, 2026-10-17
+#
+#
+# 1. INTRODUCTION
+#
+# This module reports the schema changes made by upgrading Bugzilla
+# from one version to another, one schema change at a time, and says
+# how MySQL will apply each change to a table:
+#
+#   'instant':  by changing only the table's metadata;
+#   'in place': without copying the table, though perhaps scanning it
+#               (to build an index) or rebuilding it;
+#   'copy':     by copying the whole table, which is locked against
+#               writes meanwhile.
+#
+# Given the sizes of the tables (see section 4), it estimates the I/O
+# each change needs, and so the total for each table and for the
+# whole upgrade.  For instance:
+#
+#   python upgrade_cost.py 3.0 3.4.2 sizes.txt
+#
+# The rules are those of InnoDB's online DDL in MySQL 8.0.  Any change
+# to a MyISAM table copies it.  Where a table's engine was not
+# captured with its schema, it is assumed (see section 2), and the
+# report says so.  The figures are estimates: they count each byte of
+# the table read or written, and take no account of caching, of the
+# buffer pool, or of the time taken to sort.
+#
+# The intended readership is project developers and site
+# administrators.
+#
+# This document is not confidential.
+
+import string
+import sys
+
+import get_schema
+import make_schema_doc
+import schema_remarks
+
+error = 'estimating an upgrade'
+
+# 2. Classifying changes.
+#
+# A change is a tuple (table, description, method, io), where method
+# is one of the methods above and io says what I/O it needs:
+#
+#   'none':    none;
+#   'scan':    reading the table once (to build an index);
+#   'rebuild': reading the table and writing it again, in place;
+#   'copy':    reading the table and writing a copy.
+
+def properties(column):
+    if column.properties == '-':
+        return []
+    return string.split(column.properties, ', ')
+
+def column_changes(table, old, new):
+    changes = []
+    names = old.keys() + filter(lambda n, o=old: not o.has_key(n), new.keys())
+    names.sort()
+    for name in names:
+        if not old.has_key(name):
+            # An auto_increment column can't be added instantly.
+            if 'auto_increment' in properties(new[name]):
+                changes.append((table, "add column '%s'" % new[name].name,
+                                'in place', 'rebuild'))
+            else:
+                changes.append((table, "add column '%s'" % new[name].name,
+                                'instant', 'none'))
+            continue
+        if not new.has_key(name):
+            changes.append((table, "drop column '%s'" % old[name].name,
+                            'in place', 'rebuild'))
+            continue
+        (o, n) = (old[name], new[name])
+        if o.type != n.type:
+            changes.append((table, "change column '%s' from %s to %s"
+                            % (n.name, o.type, n.type), 'copy', 'copy'))
+        else:
+            op = properties(o)
+            np = properties(n)
+            if filter(lambda p: p != 'null', op) != filter(lambda p: p != 'null', np):
+                changes.append((table, "change column '%s' from %s to %s"
+                                % (n.name, o.properties, n.properties),
+                                'copy', 'copy'))
+            elif op != np:
+                if 'null' in np:
+                    what = 'null'
+                else:
+                    what = 'not null'
+                changes.append((table, "make column '%s' %s" % (n.name, what),
+                                'in place', 'rebuild'))
+        if o.default != n.default:
+            changes.append((table, "change default of column '%s' from %s to %s"
+                            % (n.name, o.default, n.default),
+                            'instant', 'none'))
+        if o.name != n.name:
+            changes.append((table, "rename column '%s' to '%s'"
+                            % (o.name, n.name), 'instant', 'none'))
+    return changes
+
+# Adding an index scans the table, except that a primary key or the
+# first full text index rebuilds it.  Dropping an index is quick,
+# except that dropping a primary key copies the table.
+
+def add_index(table, index, new_indexes):
+    if index.name == 'PRIMARY':
+        return (table, 'add primary key (%s)' % index.fields,
+                'in place', 'rebuild')
+    if 'full text' in index.properties and not filter(
+        lambda i, n=index.name: i.name != n and 'full text' in i.properties,
+        new_indexes.values()):
+        return (table, "add full text index '%s' (%s)"
+                % (index.name, index.fields), 'in place', 'rebuild')
+    return (table, "add index '%s' (%s)" % (index.name, index.fields),
+            'in place', 'scan')
+
+def drop_index(table, index):
+    if index.name == 'PRIMARY':
+        return (table, 'drop primary key', 'copy', 'copy')
+    return (table, "drop index '%s'" % index.name, 'in place', 'none')
+
+def index_changes(table, old, new):
+    changes = []
+    names = old.keys() + filter(lambda n, o=old: not o.has_key(n), new.keys())
+    names.sort()
+    for name in names:
+        if not old.has_key(name):
+            changes.append(add_index(table, new[name], new))
+        elif not new.has_key(name):
+            changes.append(drop_index(table, old[name]))
+        else:
+            (o, n) = (old[name], new[name])
+            if o.fields != n.fields or o.properties != n.properties:
+                if name == 'PRIMARY':
+                    changes.append((table, 'change primary key from (%s) to (%s)'
+                                    % (o.fields, n.fields),
+                                    'in place', 'rebuild'))
+                else:
+                    changes.append(drop_index(table, o))
+                    changes.append(add_index(table, n, new))
+            elif o.name != n.name:
+                changes.append((table, "rename index '%s' to '%s'"
+                                % (o.name, n.name), 'instant', 'none'))
+    return changes
+
+# The changes from one reduced schema to the next.  engines maps table
+# name to storage engine, in the old schema; a change to a MyISAM
+# table copies it.
+
+def table_changes(old, new, engines):
+    changes = []
+    tables = old.keys() + filter(lambda t, o=old: not o.has_key(t), new.keys())
+    tables.sort()
+    for table in tables:
+        if not old.has_key(table):
+            changes.append((table, 'create table', 'instant', 'none'))
+            continue
+        if not new.has_key(table):
+            changes.append((table, 'drop table', 'instant', 'none'))
+            continue
+        tc = (column_changes(table, old[table].columns, new[table].columns) +
+              index_changes(table, old[table].indexes, new[table].indexes))
+        if engines.get(table, default_engine).upper() == 'MYISAM':
+            tc = map(lambda c: (c[0], c[1], 'copy', 'copy'), tc)
+        changes.extend(tc)
+    return changes
+
+# The engine of a table whose engine was not captured (see
+# get_schema.get_physical) is assumed: MyISAM if the table has a full
+# text index in the old or new schema (only MyISAM had those in the
+# MySQL versions Bugzilla then supported), or if the Bugzilla version
+# comes before innodb_version (whose checksetup.pl converted tables to
+# InnoDB); otherwise default_engine.
+
+default_engine = 'InnoDB'
+innodb_version = '3.2'
+
+def has_full_text(table):
+    return filter(lambda i: 'full text' in i.properties,
+                  table.indexes.values())
+
+def assumed_engine(bugzilla_version, table, old, new):
+    if ((old.has_key(table) and has_full_text(old[table])) or
+        (new.has_key(table) and has_full_text(new[table]))):
+        return 'MyISAM'
+    if make_schema_doc.version_compare(bugzilla_version, innodb_version) < 0:
+        return 'MyISAM'
+    return default_engine
+
+# Return (engines, assumed): maps from table name to engine for the
+# tables of the old schema (named schema_version) when upgrading from
+# Bugzilla version bugzilla_version to the new.  assumed has the
+# tables whose engines were assumed rather than captured.
+
+def schema_engines(bugzilla_version, schema_version, old, new):
+    engines = {}
+    for (table, storage) in get_schema.get_physical(schema_version).items():
+        if storage.engine:
+            engines[table] = storage.engine
+    assumed = {}
+    for table in old.keys():
+        if not engines.has_key(table):
+            assumed[table] = assumed_engine(bugzilla_version, table, old, new)
+            engines[table] = assumed[table]
+    return (engines, assumed)
+
+# 3. Estimating I/O.
+#
+# The bytes of I/O for a change to a table of the given Size: a scan
+# reads the data; a rebuild or a copy reads the data and indexes and
+# writes them again (the difference is that a copy locks the table).
+# Without a size, the I/O is unknown (None), unless there is none.
+
+def change_io(io, size):
+    if io == 'none':
+        return 0
+    if size is None or size.data_length is None:
+        return None
+    if io == 'scan':
+        return size.data_length
+    return 2 * (size.data_length + (size.index_length or 0))
+
+# Return a list of (Bugzilla version, schema name, changes, assumed)
+# for the schema changes from first to last, where changes is a list
+# of (table, description, method, io bytes), and assumed maps the
+# names of the changed tables whose engines were assumed to those
+# engines.  sizes maps table name to Size (see get_schema.get_sizes),
+# or is None.
+
+def upgrade_steps(first, last, sizes=None):
+    if sizes is None:
+        sizes = {}
+    (bugzilla_versions, changes) = make_schema_doc.schema_changes(first, last)
+    errors = []
+    schemas = get_schema.get_schemas(map(lambda c: c[1], changes), errors)
+    steps = []
+    for i in range(1, len(changes)):
+        (bz_name, schema_name) = changes[i]
+        # the version from which this step upgrades
+        registry = make_schema_doc.get_version_registry()
+        before = registry.versions[registry.position(bz_name) - 1]
+        (engines, assumed) = schema_engines(before, changes[i - 1][1],
+                                            schemas[i - 1], schemas[i])
+        step = []
+        step_assumed = {}
+        for (table, description, method, io) in table_changes(
+            schemas[i - 1], schemas[i], engines):
+            step.append((table, description, method,
+                         change_io(io, sizes.get(table))))
+            if assumed.has_key(table):
+                step_assumed[table] = assumed[table]
+        steps.append((bz_name, schema_name, step, step_assumed))
+    return steps
+
+# 4. Table sizes.
+#
+# The sizes come from the sizes recorded with pickle_schema.pickle_sizes
+# for the schema of the first version, or from a text file with a line
+# for each table:
+#
+#   table rows data-length index-length
+#
+# where the lengths are in bytes.  Blank lines and lines starting '#'
+# are ignored.
+
+def read_sizes_file(path):
+    sizes = {}
+    f = open(path, 'r')
+    try:
+        for line in f.readlines():
+            if line[:1] == '#' or not line.strip():
+                continue
+            fields = line.split()
+            if len(fields) != 4:
+                raise error, "Can't read sizes line '%s'." % line.strip()
+            (table, rows, data, indexes) = fields
+            sizes[table] = get_schema.Size(long(rows), long(data),
+                                           long(indexes), {})
+    finally:
+        f.close()
+    return sizes
+
+def get_sizes(first, path=None):
+    if path is not None:
+        return read_sizes_file(path)
+    return get_schema.get_sizes(schema_remarks.version_schema_map[first])
+
+# 5. The report.
+
+def format_io(n):
+    if n is None:
+        return '?'
+    return make_schema_doc.format_bytes(n)
+
+def report(first, last, sizes_path=None):
+    sizes = get_sizes(first, sizes_path)
+    steps = upgrade_steps(first, last, sizes)
+    totals = {}
+    unknown = {}
+    for (bz_name, schema_name, step, assumed) in steps:
+        print 'Upgrading to %s:' % bz_name
+        if not step:
+            print '  no changes'
+        for (table, description, method, io) in step:
+            print '  %-24s %-8s %10s  %s' % (table, method, format_io(io),
+                                             description)
+            if io is None:
+                unknown[table] = 1
+            else:
+                totals[table] = totals.get(table, 0) + io
+        if assumed:
+            tables = assumed.keys()
+            tables.sort()
+            print '  Engines assumed, not captured: %s' % string.join(
+                map(lambda t, a=assumed: '%s %s' % (t, a[t]), tables), ', ')
+        print
+    tables = filter(lambda t, u=unknown: not u.has_key(t), totals.keys())
+    tables = filter(lambda t, t0=totals: t0[t], tables) + unknown.keys()
+    tables.sort(lambda a, b, t=totals: cmp(t.get(b, 0), t.get(a, 0)) or cmp(a, b))
+    print 'I/O by table:'
+    for table in tables:
+        total = format_io(totals.get(table, 0))
+        if unknown.has_key(table):
+            if totals.get(table):
+                total = total + ' and more'
+            else:
+                total = '? (size unknown)'
+        print '  %-24s %s' % (table, total)
+    print 'Total: %s' % format_io(reduce(lambda a, b: a + b, totals.values(), 0))
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        print 'Usage: python upgrade_cost.py first-version last-version [sizes-file]'
+        sys.exit(1)
+    apply(report, sys.argv[1:])
+
+# A. REFERENCES
+#
+#
+# B. DOCUMENT HISTORY
+#
+# 2026-10-17 Created.
+#
+#
+# C. COPYRIGHT AND LICENSE
+#
+# This file is copyright (c) 2026 Perforce Software, Inc.  All rights
+# reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1.  Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+# 2.  Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# HOLDERS AND CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS
+# OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR
+# TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGE.
+#
+#
+# $Id$